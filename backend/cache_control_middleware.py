@@ -0,0 +1,84 @@
+from functools import wraps
+
+from django.utils.cache import patch_vary_headers
+
+
+def cache_policy(max_age=60, stale_while_revalidate=300):
+    """
+    Decorator que define a política de cache de uma view pública.
+
+    Deve ser usado apenas em views cujo conteúdo não depende do usuário
+    autenticado. A view apenas marca a resposta; os cabeçalhos finais são
+    aplicados pelo CachePolicyMiddleware, que roda depois dos middlewares de
+    sessão e CSRF e por isso consegue remover cookies e o Vary: Cookie.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            response._cache_policy = (max_age, stale_while_revalidate)
+            return response
+        return wrapped_view
+    return decorator
+
+
+class CachePolicyMiddleware:
+    """
+    Aplica Cache-Control e Vary às respostas marcadas com @cache_policy.
+
+    - Visitantes anônimos recebem 'public, max-age, stale-while-revalidate',
+      sem Set-Cookie e sem Vary: Cookie, para que CDN e navegador possam
+      reutilizar a resposta.
+    - Usuários autenticados recebem 'private', para que caches compartilhados
+      nunca armazenem a resposta.
+
+    Precisa ficar ANTES de SessionMiddleware e CsrfViewMiddleware na lista
+    MIDDLEWARE para processar a resposta depois deles.
+    """
+
+    CACHEABLE_METHODS = ('GET', 'HEAD')
+    CACHEABLE_STATUS = (200, 301, 304)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        policy = getattr(response, '_cache_policy', None)
+        if policy is None:
+            return response
+
+        if (request.method not in self.CACHEABLE_METHODS
+                or response.status_code not in self.CACHEABLE_STATUS):
+            response['Cache-Control'] = 'no-store'
+            return response
+
+        max_age, stale_while_revalidate = policy
+        user = getattr(request, 'user', None)
+
+        if user is not None and user.is_authenticated:
+            response['Cache-Control'] = f'private, max-age={max_age}'
+            patch_vary_headers(response, ('Authorization', 'Cookie'))
+            return response
+
+        response['Cache-Control'] = (
+            f'public, max-age={max_age}, '
+            f'stale-while-revalidate={stale_while_revalidate}'
+        )
+
+        # O conteúdo não depende de cookies: remover cookies de sessão/CSRF
+        # e o Vary: Cookie adicionado pelo SessionMiddleware
+        response.cookies.clear()
+        if response.has_header('Vary'):
+            vary = [
+                header.strip() for header in response['Vary'].split(',')
+                if header.strip() and header.strip().lower() != 'cookie'
+            ]
+            if vary:
+                response['Vary'] = ', '.join(vary)
+            else:
+                del response['Vary']
+        patch_vary_headers(response, ('Authorization', 'Accept-Encoding'))
+
+        return response
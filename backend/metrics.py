@@ -0,0 +1,278 @@
+"""
+Métricas por rota compartilhadas entre os workers do gunicorn.
+
+O MetricsMiddleware registra, para cada requisição, o nome da rota
+(resolver_match.view_name, ex.: search_recipes, recipe-detail), o método, o
+status e a latência. A quantidade de consultas ao banco e os acertos e faltas
+de cache vêm da coleta de backend.perf e por isso só existem para a amostra
+de requisições escolhida pelo ServerTimingMiddleware
+(SERVER_TIMING_SAMPLE_RATE); as demais não pagam essa instrumentação.
+
+Cada processo acumula os números em memória e grava periodicamente um
+arquivo JSON próprio em METRICS_DIR (escrita em arquivo temporário seguida de
+os.replace, então quem lê nunca vê um arquivo pela metade). O endpoint
+interno /internal/metrics soma os arquivos de todos os processos e responde
+no formato texto do Prometheus. Os números são acumulados desde o início de
+cada processo: quando um worker é reciclado, o Prometheus trata a queda como
+reinício do contador.
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+
+from . import perf
+
+logger = logging.getLogger('django')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+DEFAULT_FLUSH_INTERVAL = 10
+DEFAULT_STALE_SECONDS = 86400
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def default_metrics_dir():
+    return os.path.join(tempfile.gettempdir(), 'veg-backend-metrics')
+
+
+def _bucket_index(buckets, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)  # +Inf
+
+
+class Histogram:
+    def __init__(self, buckets):
+        # Contagens não cumulativas; a última posição é o +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.buckets = buckets
+
+    def observe(self, value):
+        self.counts[_bucket_index(self.buckets, value)] += 1
+        self.sum += value
+
+    def as_dict(self):
+        return {'counts': list(self.counts), 'sum': self.sum}
+
+
+class MetricsRegistry:
+    """Métricas do processo atual, gravadas em METRICS_DIR/metrics-<pid>-<id>.json"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # O id distingue processos que reaproveitam o mesmo pid
+        self.filename = f'metrics-{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.db_queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+            self.cache = defaultdict(lambda: [0, 0])
+
+    def observe(self, route, method, status, seconds, timings=None):
+        """Registra uma requisição; timings é a coleta de backend.perf, se amostrada"""
+        with self._lock:
+            self.requests[(route, method, str(status))] += 1
+            self.latency[route].observe(seconds)
+            if timings is not None:
+                self.db_queries[route].observe(timings.db_queries)
+                self.cache[route][0] += timings.cache_hits
+                self.cache[route][1] += timings.cache_misses
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': [[*key, count] for key, count in self.requests.items()],
+                'latency': {route: histogram.as_dict() for route, histogram in self.latency.items()},
+                'db_queries': {route: histogram.as_dict() for route, histogram in self.db_queries.items()},
+                'cache': {route: list(counts) for route, counts in self.cache.items()},
+            }
+
+    def flush(self, directory=None):
+        """Grava o arquivo deste processo de forma atômica"""
+        directory = directory or getattr(settings, 'METRICS_DIR', None) or default_metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as tmp:
+                json.dump(self.snapshot(), tmp)
+            os.replace(tmp_path, os.path.join(directory, self.filename))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+        if time.monotonic() - self._last_flush < interval:
+            return
+        try:
+            self.flush()
+        except OSError as e:
+            # Métricas não podem derrubar a requisição
+            self._last_flush = time.monotonic()
+            logger.error(f"Erro ao gravar métricas em METRICS_DIR: {str(e)}")
+
+
+registry = MetricsRegistry()
+
+
+def _flush_at_exit():
+    try:
+        registry.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _merge_histogram(target, data):
+    if target is None:
+        return {'counts': list(data['counts']), 'sum': data['sum']}
+    target['counts'] = [a + b for a, b in zip(target['counts'], data['counts'])]
+    target['sum'] += data['sum']
+    return target
+
+
+def collect_all(directory=None):
+    """
+    Soma os arquivos de todos os processos.
+
+    Arquivos sem gravação há mais de METRICS_STALE_SECONDS (processos que já
+    terminaram) são apagados.
+    """
+    directory = directory or getattr(settings, 'METRICS_DIR', None) or default_metrics_dir()
+    stale = getattr(settings, 'METRICS_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+    merged = {'requests': defaultdict(int), 'latency': {}, 'db_queries': {}, 'cache': defaultdict(lambda: [0, 0])}
+    if not os.path.isdir(directory):
+        return merged
+
+    now = time.time()
+    for name in os.listdir(directory):
+        if not (name.startswith('metrics-') and name.endswith('.json')):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if now - os.path.getmtime(path) > stale and name != registry.filename:
+                os.unlink(path)
+                continue
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # arquivo removido ou de outra versão
+
+        for route, method, status, count in data.get('requests', []):
+            merged['requests'][(route, method, status)] += count
+        for kind in ('latency', 'db_queries'):
+            for route, histogram in data.get(kind, {}).items():
+                merged[kind][route] = _merge_histogram(merged[kind].get(route), histogram)
+        for route, (hits, misses) in data.get('cache', {}).items():
+            merged['cache'][route][0] += hits
+            merged['cache'][route][1] += misses
+    return merged
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(name, buckets, histograms):
+    lines = []
+    for route, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip([*buckets, '+Inf'], histogram['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{{route="{_label(route)}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{route="{_label(route)}"}} {_format_number(histogram["sum"])}')
+        lines.append(f'{name}_count{{route="{_label(route)}"}} {cumulative}')
+    return lines
+
+
+def render_prometheus(merged):
+    """Formato texto de exposição do Prometheus (versão 0.0.4)"""
+    lines = [
+        '# HELP veg_http_requests_total Requisições atendidas por rota, método e status.',
+        '# TYPE veg_http_requests_total counter',
+    ]
+    for (route, method, status), count in sorted(merged['requests'].items()):
+        lines.append(
+            f'veg_http_requests_total{{route="{_label(route)}",method="{_label(method)}",'
+            f'status="{_label(status)}"}} {count}'
+        )
+
+    lines += [
+        '# HELP veg_http_request_duration_seconds Latência das requisições por rota.',
+        '# TYPE veg_http_request_duration_seconds histogram',
+    ]
+    lines += _histogram_lines('veg_http_request_duration_seconds', LATENCY_BUCKETS, merged['latency'])
+
+    lines += [
+        '# HELP veg_db_queries_per_request Consultas ao banco por requisição, por rota (requisições amostradas).',
+        '# TYPE veg_db_queries_per_request histogram',
+    ]
+    lines += _histogram_lines('veg_db_queries_per_request', QUERY_BUCKETS, merged['db_queries'])
+
+    lines += [
+        '# HELP veg_cache_requests_total Leituras de cache por rota e resultado (requisições amostradas).',
+        '# TYPE veg_cache_requests_total counter',
+    ]
+    ratios = []
+    for route, (hits, misses) in sorted(merged['cache'].items()):
+        lines.append(f'veg_cache_requests_total{{route="{_label(route)}",result="hit"}} {hits}')
+        lines.append(f'veg_cache_requests_total{{route="{_label(route)}",result="miss"}} {misses}')
+        if hits + misses:
+            ratios.append(f'veg_cache_hit_ratio{{route="{_label(route)}"}} {hits / (hits + misses):.4f}')
+    lines += [
+        '# HELP veg_cache_hit_ratio Fração de acertos de cache por rota desde o início dos processos.',
+        '# TYPE veg_cache_hit_ratio gauge',
+        *ratios,
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Registra as métricas de cada requisição no registry do processo.
+
+    Deve vir antes do ServerTimingMiddleware. Mede apenas o tempo de parede;
+    quando o ServerTimingMiddleware amostrou a requisição, reaproveita a
+    coleta dele (perf.sampled_timings) para banco e cache.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = (match.view_name if match else None) or UNMATCHED_ROUTE
+        registry.observe(
+            route, request.method, response.status_code, elapsed, perf.sampled_timings(request),
+        )
+        registry.maybe_flush()
+        return response
@@ -1,13 +1,33 @@
+from django.conf import settings
 from django.http import HttpResponse
 from django.core.cache import cache
 from datetime import datetime, timedelta
 
+
+def client_ip(request):
+    """
+    IP do cliente que fez a requisição.
+
+    Atrás de TRUSTED_PROXY_COUNT proxies, cada um acrescenta ao X-Forwarded-For
+    o endereço de quem o chamou; o IP do cliente é o valor acrescentado pelo
+    proxy mais externo. Entradas à esquerda dele vêm do próprio cliente e podem
+    ser forjadas, por isso são ignoradas. Sem proxies usa o REMOTE_ADDR.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    if proxies > 0:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
 class RateLimitMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        ip = request.META.get('REMOTE_ADDR')
+        ip = client_ip(request)
         key = f'rate_limit_{ip}'
         
         requests = cache.get(key, [])
@@ -0,0 +1,190 @@
+"""
+Medição de desempenho por requisição.
+
+collect() abre uma coleta para a requisição atual (guardada em uma
+ContextVar) e registra:
+
+- tempo e quantidade de consultas ao banco, por connection.execute_wrapper;
+- acertos e faltas de cache, pelo backend InstrumentedLocMemCache;
+- tempo de serialização, pelo TimedSerializerMixin dos serializers do DRF.
+
+O ServerTimingMiddleware coleta uma amostra das requisições
+(SERVER_TIMING_SAMPLE_RATE, desligada por padrão) e registra os números em
+um log estruturado; o MetricsMiddleware (backend.metrics) reaproveita a
+coleta dessas mesmas requisições. O cabeçalho Server-Timing só é devolvido
+a usuários staff: as respostas deles nunca são públicas, então os tempos
+não vazam para clientes nem ficam guardados em CDN. Sem coleta ativa os
+pontos de medição só consultam a ContextVar, sem custo perceptível.
+
+Consultas feitas em outras threads (ex.: seções da home montadas em paralelo)
+não passam pelo wrapper e não entram na conta.
+"""
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+
+logger = logging.getLogger('django')
+
+DEFAULT_SAMPLE_RATE = 0.0
+
+_current = ContextVar('perf_timings', default=None)
+_MISSING = object()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serializer_time = 0.0
+        self._serializer_depth = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+    def server_timing(self):
+        """Valor do cabeçalho Server-Timing (durações em milissegundos)"""
+        return ', '.join([
+            f'total;dur={self.elapsed() * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} misses"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+        ])
+
+    def as_log_fields(self):
+        return {
+            'total_ms': round(self.elapsed() * 1000, 1),
+            'db_ms': round(self.db_time * 1000, 1),
+            'db_queries': self.db_queries,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'serializer_ms': round(self.serializer_time * 1000, 1),
+        }
+
+
+def current():
+    """Coleta ativa na requisição atual, ou None"""
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Ativa a coleta até o fim do bloco; reaproveita uma coleta já ativa"""
+    timings = _current.get()
+    if timings is not None:
+        yield timings
+        return
+
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings.db_wrapper))
+            yield timings
+    finally:
+        _current.reset(token)
+
+
+def sampled_timings(request):
+    """Coleta da requisição, se o ServerTimingMiddleware a amostrou"""
+    return getattr(request, '_perf_timings', None)
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """LocMemCache que conta acertos e faltas na coleta ativa"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        timings = _current.get()
+        if timings is not None:
+            if value is _MISSING:
+                timings.cache_misses += 1
+            else:
+                timings.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        timings = _current.get()
+        if timings is not None:
+            timings.cache_hits += len(found)
+            timings.cache_misses += len(keys) - len(found)
+        return found
+
+
+class TimedSerializerMixin:
+    """
+    Soma o tempo de to_representation à coleta ativa.
+
+    Só a serialização mais externa é medida: serializers aninhados rodam
+    dentro dela e não são contados de novo.
+    """
+
+    def to_representation(self, instance):
+        timings = _current.get()
+        if timings is None or timings._serializer_depth:
+            return super().to_representation(instance)
+
+        timings._serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializer_time += time.perf_counter() - start
+            timings._serializer_depth -= 1
+
+
+class ServerTimingMiddleware:
+    """
+    Mede uma amostra das requisições e devolve Server-Timing a staff.
+
+    Deve ficar no início de MIDDLEWARE (logo depois do MetricsMiddleware)
+    para que o tempo total inclua os demais middlewares.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+        if rate <= 0 or random.random() >= rate:
+            return self.get_response(request)
+
+        with collect() as timings:
+            request._perf_timings = timings
+            response = self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = timings.server_timing()
+        match = getattr(request, 'resolver_match', None)
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'route': match.view_name if match else None,
+            'status': response.status_code,
+            **timings.as_log_fields(),
+        }
+        logger.info(
+            'perf ' + ' '.join(f'{name}={value}' for name, value in fields.items()),
+            extra={'perf': fields},
+        )
+        return response
@@ -143,13 +143,16 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
     # Desativar throttling para desenvolvimento
     'DEFAULT_THROTTLE_CLASSES': [],
-    'DEFAULT_THROTTLE_RATES': {}
+    # Limites por escopo, aplicados só nas views que declaram o throttle
+    'DEFAULT_THROTTLE_RATES': {
+        'availability': '30/min',
+    }
 }
 
 SIMPLE_JWT = {
@@ -159,8 +162,11 @@ SIMPLE_JWT = {
 }
 
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',  # Primeiro: métricas por rota de todas as requisições
+    'backend.perf.ServerTimingMiddleware',  # O tempo total inclui os demais middlewares
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add whitenoise middleware
+    'backend.cache_control_middleware.CachePolicyMiddleware',  # Deve vir antes de Session/CSRF
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Deve estar no início
     'django.middleware.common.CommonMiddleware',
@@ -173,13 +179,90 @@ MIDDLEWARE = [
     'backend.detailed_error_middleware.DetailedErrorMiddleware',
 ]
 
+# Número de proxies confiáveis na frente da aplicação (1 no Render). O IP do
+# cliente vem do X-Forwarded-For (backend.middleware.client_ip); com 0 usa o
+# REMOTE_ADDR. Compartilhado pelo rate limit e pela contagem de visitantes
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
 # Configurações de cache para rate limiting
+#
+# O LocMemCache é por processo: cada worker do gunicorn tem o seu, e uma
+# invalidação (delete, incremento de versão) só alcança o worker que a fez. Nos
+# demais o valor antigo segue válido até expirar, por isso os caches que
+# dependem de invalidação (rankings, slugs, usuários da autenticação) usam TTLs
+# curtos. Com um backend compartilhado (Redis, Memcached) os TTLs podem crescer.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # LocMemCache que conta acertos e faltas para o Server-Timing (backend.perf)
+        'BACKEND': 'backend.perf.InstrumentedLocMemCache',
     }
 }
 
+# Fração das requisições medidas (backend.perf); desligado por padrão. O log
+# registra toda a amostra, mas o cabeçalho Server-Timing só vai para staff
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', 0))
+
+# Métricas por rota em /internal/metrics (backend.metrics)
+# Desligado por padrão para que testes e desenvolvimento não gravem arquivos;
+# o render.yaml liga em produção
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False') == 'True'
+METRICS_DIR = os.environ.get('METRICS_DIR', '')  # vazio: diretório temporário do sistema
+METRICS_FLUSH_INTERVAL = 10  # segundos entre gravações do arquivo de cada worker
+METRICS_STALE_SECONDS = 86400  # arquivos de workers encerrados são descartados depois disso
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+INTERNAL_IPS = [ip for ip in os.environ.get('INTERNAL_IPS', '127.0.0.1').split(',') if ip]
+
+# Taxonomia de receitas (recipes.taxonomy)
+TAXONOMY_REFRESH_SECONDS = 3600  # intervalo de recompilação das contagens por worker
+
+# Página inicial agregada (recipes.home)
+HOME_SECTION_TTL = 60  # segundos de cache por seção
+HOME_BUNDLE_MAX_WORKERS = int(os.environ.get('HOME_BUNDLE_MAX_WORKERS', 4))
+
+# Pontuação de tendência (recipes.trending)
+TRENDING_HALF_LIFE_DAYS = 3
+TRENDING_WINDOW_DAYS = 28
+TRENDING_RATING_WEIGHT = 5
+
+# Agregados diários de visualizações e avaliações (recipes.rollups)
+ROLLUP_FLUSH_INTERVAL = 30  # segundos entre descargas do buffer
+ROLLUP_FLUSH_MAX_PENDING = 500  # descarga antecipada ao atingir esse número de agregados
+
+# Avaliações: média bayesiana (recipes.leaderboards) e retenção do histórico (recipes.ratings)
+RATING_PRIOR_MEAN = 7.0  # nota média esperada de uma receita
+RATING_PRIOR_WEIGHT = 10  # quantidade de avaliações "virtuais" com a nota média
+RATING_HISTORY_RETENTION_DAYS = 90  # histórico completo mantido antes da compactação
+
+# Cache de resolução slug -> receita (recipes.slugs)
+SLUG_CACHE_TTL = 30  # segundos no cache do Django; curto, veja CACHES
+SLUG_CACHE_LOCAL_SIZE = 1024  # entradas no LRU de cada processo
+SLUG_CACHE_LOCAL_TTL = 30  # curto: a invalidação não alcança outros workers
+
+# Cache de usuários da autenticação JWT (users.authentication)
+AUTH_USER_CACHE_TTL = 10  # segundos; curto, veja CACHES
+
+# Pool de hash de senhas (users.hashing)
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))  # executando + na fila
+# Threads de requisição por worker (gthread); o pool admite no máximo uma a menos
+PASSWORD_HASH_REQUEST_THREADS = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Sessões no login (users.views.start_session)
+# 'jwt': apenas tokens, nenhuma sessão gravada; 'session': login() do Django
+AUTH_SESSION_MODE = os.environ.get('AUTH_SESSION_MODE', 'session')
+# Para o modo 'session': ...backends.signed_cookies não usa o banco e
+# ...backends.cached_db lê do cache antes do banco
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+
+# Filtro de Bloom da verificação de disponibilidade (users.availability)
+AVAILABILITY_BLOOM_CAPACITY = 100000
+AVAILABILITY_BLOOM_ERROR_RATE = 0.01
+AVAILABILITY_REFRESH_SECONDS = 300  # remontagem para incluir cadastros de outros workers
+
+# Página pública do autor (recipes.profiles)
+AUTHOR_PROFILE_CACHE_TTL = 300  # segundos; gravações do autor descartam o cache antes
+AUTHOR_PROFILE_PAGE_SIZE = 12
+
 # Configure WhiteNoise
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
@@ -288,12 +371,29 @@ if not DATABASE_URL:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            # BEGIN IMMEDIATE: transações simultâneas esperam a vez (até timeout
+            # segundos) em vez de falhar com "database is locked" ao escrever.
+            # O modo vale para a conexão inteira, não só para os caminhos de
+            # escrita: todo atomic(), mesmo só de leitura, pega a trava de
+            # escrita e serializa com os demais. Consultas fora de atomic()
+            # rodam em autocommit e não são afetadas. Só vale para o SQLite de
+            # desenvolvimento; em produção (PostgreSQL) a opção não existe
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+            # Banco de testes em arquivo para que testes com threads
+            # (ConcurrentRatingTests) vejam os mesmos dados
+            'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
         }
     }
 else:
     # Em produção, usar o PostgreSQL do Render
+    # Conexões persistentes: as threads de requisição e as do pool da página
+    # inicial (recipes.home) reaproveitam a conexão por até CONN_MAX_AGE segundos
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL)
+        'default': dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=int(os.environ.get('CONN_MAX_AGE', 60)),
+            conn_health_checks=True,
+        )
     }
 
 
@@ -4,11 +4,14 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.views.static import serve
 
+from .views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('recipes.urls')),
     path('api/auth/', include('users.urls_auth')),
     path('api/user/', include('users.urls')),
+    path('internal/metrics', metrics_view, name='internal_metrics'),
     
     # Servir arquivos de mídia em produção
     re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
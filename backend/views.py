@@ -1,2 +1,33 @@
-from django.http import JsonResponse
-from django.views import View
\ No newline at end of file
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+
+from .metrics import collect_all, registry, render_prometheus
+
+
+def _metrics_allowed(request):
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'INTERNAL_IPS', []):
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+def metrics_view(request):
+    """
+    Métricas de todos os workers no formato texto do Prometheus.
+
+    Acessível apenas a partir de INTERNAL_IPS ou com Authorization: Bearer
+    <METRICS_TOKEN>.
+    """
+    if not _metrics_allowed(request):
+        return JsonResponse({'error': 'Acesso negado'}, status=403)
+
+    # Gravar antes de ler para que este worker apareça com os números atuais
+    registry.flush()
+    return HttpResponse(
+        render_prometheus(collect_all()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Teste de carga misturando logins com navegação de receitas.
+
+Mede a latência das leituras (home, busca e detalhe por slug) enquanto uma
+parte dos clientes faz login sem parar, para verificar se os hashes de senha
+deixam de bloquear o restante do tráfego.
+
+Uso:
+    python benchmark_auth_load.py --base-url http://localhost:8000 \\
+        --identifier usuario --password senha --clients 20 --login-ratio 0.3 --duration 30
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def request(url, data=None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        payload = e.read()
+        status = e.code
+    except urllib.error.URLError:
+        payload = b''
+        status = 0
+    return status, (time.perf_counter() - start) * 1000, payload
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--identifier', required=True, help='Usuário ou email usado nos logins')
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--login-ratio', type=float, default=0.3, help='Fração dos clientes que só fazem login')
+    parser.add_argument('--duration', type=float, default=30, help='Segundos de teste')
+    args = parser.parse_args()
+
+    api = args.base_url.rstrip('/') + '/api'
+    status, _, payload = request(f'{api}/recipes/search/?limit=50')
+    slugs = [item['slug'] for item in json.loads(payload or b'{}').get('results', [])] if status == 200 else []
+    if not slugs:
+        print('⚠️ Nenhuma receita encontrada; a navegação usará apenas home e busca')
+
+    results = {'login': [], 'read': []}
+    statuses = {'login': {}, 'read': {}}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def record(kind, status, elapsed):
+        with lock:
+            results[kind].append(elapsed)
+            statuses[kind][status] = statuses[kind].get(status, 0) + 1
+
+    def login_client():
+        while time.monotonic() < deadline:
+            status, elapsed, _ = request(
+                f'{api}/auth/login/', {'identifier': args.identifier, 'password': args.password}
+            )
+            record('login', status, elapsed)
+
+    def browse_client():
+        pages = [f'{api}/recipes/home/', f'{api}/recipes/search/?page=1&limit=30']
+        while time.monotonic() < deadline:
+            if slugs and random.random() < 0.6:
+                url = f'{api}/recipes/by-slug/{random.choice(slugs)}/'
+            else:
+                url = random.choice(pages)
+            status, elapsed, _ = request(url)
+            record('read', status, elapsed)
+
+    login_clients = int(args.clients * args.login_ratio)
+    threads = [threading.Thread(target=login_client) for _ in range(login_clients)]
+    threads += [threading.Thread(target=browse_client) for _ in range(args.clients - login_clients)]
+    print(f'🚀 {login_clients} clientes de login e {args.clients - login_clients} de navegação por {args.duration}s')
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for kind, label in (('login', 'Logins'), ('read', 'Leituras')):
+        values = results[kind]
+        print(f'\n📊 {label}: {len(values)} requisições ({len(values) / args.duration:.1f}/s)')
+        print(f'   p50 {percentile(values, 0.5):.0f} ms | p95 {percentile(values, 0.95):.0f} ms | '
+              f'p99 {percentile(values, 0.99):.0f} ms')
+        print(f'   status: {dict(sorted(statuses[kind].items()))}')
+
+
+if __name__ == '__main__':
+    main()
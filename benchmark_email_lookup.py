@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Compara a busca de usuários por email com e sem o índice em LOWER(email).
+
+Cria usuários sintéticos dentro de uma transação que é desfeita no final
+(nada fica gravado), mede a busca antiga (email = ...) e a nova
+(LOWER(email) = ..., ver users.models.users_with_email) e mostra o plano de
+execução de cada uma.
+
+Uso:
+    python benchmark_email_lookup.py --users 200000 --lookups 500
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from users.models import users_with_email
+
+
+class Rollback(Exception):
+    pass
+
+
+def timed(label, emails, lookup):
+    start = time.perf_counter()
+    for email in emails:
+        lookup(email)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f'⏱️ {label}: {elapsed / len(emails):.3f} ms por busca ({len(emails)} buscas)')
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return '\n'.join('   ' + ' '.join(str(col) for col in row) for row in cursor.fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100000, help='Usuários sintéticos a criar')
+    parser.add_argument('--lookups', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            print(f'👥 Criando {args.users} usuários sintéticos (a transação será desfeita)...')
+            for start in range(0, args.users, args.batch_size):
+                User.objects.bulk_create([
+                    User(username=f'bench_{i}', email=f'Bench.User{i}@Example.com', password='!')
+                    for i in range(start, min(start + args.batch_size, args.users))
+                ])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE auth_user')
+
+            sample = random.sample(range(args.users), min(args.lookups, args.users))
+            exact = [f'Bench.User{i}@Example.com' for i in sample]
+            typed = [email.lower() for email in exact]
+
+            timed('email = (sem índice)', exact, lambda e: User.objects.filter(email=e).first())
+            timed('LOWER(email) = (índice funcional)', typed, lambda e: users_with_email(e).first())
+
+            print('\n📋 Plano da busca antiga:')
+            print(explain(User.objects.filter(email=exact[0])))
+            print('📋 Plano da busca nova:')
+            print(explain(users_with_email(typed[0])))
+            raise Rollback()
+    except Rollback:
+        print('\n✅ Usuários sintéticos removidos')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,9 @@ set -o errexit
 echo "🔧 Instalando dependências..."
 pip install -r requirements.txt
 
+echo "🗂️ Gerando taxonomia estática..."
+python manage.py build_taxonomy
+
 echo "📦 Coletando arquivos estáticos..."
 python manage.py collectstatic --no-input
 
@@ -0,0 +1,16 @@
+"""
+Configuração do gunicorn (lida automaticamente do diretório de trabalho).
+
+As opções de linha de comando do render.yaml e do Procfile continuam valendo;
+aqui ficam apenas os hooks.
+"""
+
+
+def post_worker_init(worker):
+    # Monta o filtro de Bloom da disponibilidade (users.availability) antes da
+    # primeira requisição do worker, em vez de cobrá-lo de quem chegar primeiro
+    from django.db import connections
+    from users import availability
+    availability.warm_up()
+    # As requisições rodam em outras threads; a conexão desta não seria reaproveitada
+    connections.close_all()
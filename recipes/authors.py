@@ -0,0 +1,172 @@
+"""
+Estatísticas por autor (AuthorStats) mantidas incrementalmente.
+
+Cada caminho de escrita aplica só a diferença que causou, com F() para não
+perder incrementos simultâneos:
+
+- criação e exclusão de receitas: recipes.signals e, para criações em lote,
+  RecipeManager.bulk_create;
+- visualizações: ActivityBuffer.flush (recipes.rollups);
+- avaliações: save_rating (recipes.ratings).
+
+Quando o autor ainda não tem linha, ela é calculada do zero a partir de
+Recipe e Rating. reconcile_author_stats recalcula tudo e corrige desvios
+(incrementos perdidos em falhas, exclusões feitas direto no banco).
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Greatest
+
+from .models import AuthorStats, Rating, Recipe, unpack_rating_histogram
+
+STATS_FIELDS = ['recipes_count', 'total_views', 'ratings_count', 'ratings_sum']
+
+
+def compute_author_stats(author_ids=None):
+    """Totais calculados a partir das tabelas de origem: {author_id: {campo: valor}}"""
+    recipes = Recipe.objects.all()
+    ratings = Rating.objects.all()
+    if author_ids is not None:
+        recipes = recipes.filter(author_id__in=author_ids)
+        ratings = ratings.filter(recipe__author_id__in=author_ids)
+
+    totals = defaultdict(lambda: dict.fromkeys(STATS_FIELDS, 0))
+    rows = recipes.order_by().values('author_id')\
+        .annotate(recipes_count=Count('id'), total_views=Sum('views_count'))
+    for row in rows:
+        totals[row['author_id']].update(recipes_count=row['recipes_count'], total_views=row['total_views'] or 0)
+    rows = ratings.order_by().values('recipe__author_id')\
+        .annotate(ratings_count=Count('id'), ratings_sum=Sum('score'))
+    for row in rows:
+        totals[row['recipe__author_id']].update(ratings_count=row['ratings_count'], ratings_sum=row['ratings_sum'] or 0)
+    if author_ids is not None:
+        # Autores sem receitas nem avaliações também recebem uma linha zerada
+        return {author_id: totals[author_id] for author_id in author_ids}
+    return dict(totals)
+
+
+def refresh_author_stats(author_ids):
+    """Recalcula e grava as linhas dos autores informados"""
+    rows = [
+        AuthorStats(author_id=author_id, **values)
+        for author_id, values in compute_author_stats(author_ids).items()
+    ]
+    AuthorStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['author'], update_fields=STATS_FIELDS + ['updated_at'],
+    )
+    return rows
+
+
+def adjust_author_stats(author_ids, recipes=0, views=0, ratings=0, ratings_sum=0):
+    """
+    Soma as diferenças às linhas dos autores.
+
+    Os contadores nunca ficam negativos (uma exclusão com dados antigos em
+    memória é corrigida pela reconciliação). Autores sem linha são
+    recalculados do zero, o que já inclui a alteração recém-gravada.
+    """
+    deltas = {
+        'recipes_count': recipes, 'total_views': views,
+        'ratings_count': ratings, 'ratings_sum': ratings_sum,
+    }
+    changes = {field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items() if delta}
+    if not changes or not author_ids:
+        return
+    author_ids = set(author_ids)
+    if AuthorStats.objects.filter(author_id__in=author_ids).update(**changes) == len(author_ids):
+        return
+    existing = set(AuthorStats.objects.filter(author_id__in=author_ids).values_list('author_id', flat=True))
+    refresh_author_stats(author_ids - existing)
+
+
+def recipe_created(recipe):
+    adjust_author_stats([recipe.author_id], recipes=1, views=recipe.views_count)
+
+
+def recipes_bulk_created(recipes, conflicts=False):
+    """
+    Aplica as receitas de um bulk_create, que não dispara post_save.
+
+    Com ignore_conflicts/update_conflicts não se sabe quais linhas foram de
+    fato inseridas, então os autores são recalculados do zero.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for recipe in recipes:
+        totals[recipe.author_id][0] += 1
+        totals[recipe.author_id][1] += recipe.views_count
+    if conflicts:
+        refresh_author_stats(set(totals))
+        return
+    for author_id, (count, views) in totals.items():
+        adjust_author_stats([author_id], recipes=count, views=views)
+
+
+def recipe_deleted(recipe):
+    # As avaliações saem em cascata; o histograma da receita diz quantas e com que soma
+    counts = unpack_rating_histogram(recipe.rating_histogram)
+    adjust_author_stats(
+        [recipe.author_id],
+        recipes=-1,
+        views=-recipe.views_count,
+        ratings=-sum(counts),
+        ratings_sum=-sum(score * count for score, count in enumerate(counts, start=1)),
+    )
+
+
+def add_views(views_by_author):
+    """Aplica os incrementos de visualização agrupados pelo valor do incremento"""
+    authors_by_increment = defaultdict(list)
+    for author_id, views in views_by_author.items():
+        if views:
+            authors_by_increment[views].append(author_id)
+    for views, author_ids in authors_by_increment.items():
+        adjust_author_stats(author_ids, views=views)
+
+
+def reconcile_author_stats():
+    """
+    Recalcula as estatísticas de todos os autores e corrige as linhas divergentes.
+
+    Retorna (linhas criadas, linhas corrigidas).
+    """
+    existing = {stats.author_id: stats for stats in AuthorStats.objects.all()}
+    expected = compute_author_stats()
+    for author_id in existing.keys() - expected.keys():
+        expected[author_id] = dict.fromkeys(STATS_FIELDS, 0)
+
+    created, updated = [], []
+    for author_id, values in expected.items():
+        stats = existing.get(author_id)
+        if stats is None:
+            created.append(AuthorStats(author_id=author_id, **values))
+        elif any(getattr(stats, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(stats, field, value)
+            updated.append(stats)
+    AuthorStats.objects.bulk_create(created, batch_size=500, ignore_conflicts=True)
+    AuthorStats.objects.bulk_update(updated, STATS_FIELDS, batch_size=500)
+    return len(created), len(updated)
+
+
+def serialize_author_stats(stats):
+    return {
+        'recipes_count': stats.recipes_count,
+        'total_views': stats.total_views,
+        'ratings_count': stats.ratings_count,
+        'average_rating': stats.average_rating(),
+    }
+
+
+def get_author_stats(author_id):
+    stats = AuthorStats.objects.filter(author_id=author_id).first()
+    if stats is None:
+        stats = refresh_author_stats([author_id])[0]
+    return serialize_author_stats(stats)
+
+
+def top_authors(limit):
+    """Autores mais vistos (usa o índice author_stats_top_idx)"""
+    return AuthorStats.objects.select_related('author')\
+        .filter(recipes_count__gt=0)\
+        .order_by('-total_views', 'author')[:limit]
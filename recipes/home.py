@@ -0,0 +1,132 @@
+"""
+Seções da página inicial montadas em uma única requisição.
+
+Cada seção tem seu próprio cache. As seções que não estão em cache são
+montadas em paralelo em um pool de threads, todas a partir do mesmo plano de
+consulta (summary_queryset), e a resposta final junta tudo.
+
+O pool é único por processo e suas threads mantêm a própria conexão com o
+banco entre requisições, como as threads de requisição: ela só é fechada
+quando passa de CONN_MAX_AGE ou fica inutilizável. Cada processo pode abrir
+até HOME_BUNDLE_MAX_WORKERS conexões além das usadas pelas requisições.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .models import Recipe
+from .serializers import RecipeSummarySerializer
+from .taxonomy import get_compiled_taxonomy
+from .trending import featured_queryset, trending_queryset
+
+logger = logging.getLogger('django')
+
+SECTION_CACHE_PREFIX = 'home:section:'
+DEFAULT_SECTION_TTL = 60
+DEFAULT_MAX_WORKERS = 4
+
+FEATURED_LIMIT = 5
+TRENDING_LIMIT = 10
+NEW_LIMIT = 10
+
+
+def summary_queryset():
+    """
+    Plano de consulta compartilhado pelas listas de receitas compactas.
+
+    A média vem do histograma desnormalizado (Recipe.average_rating()), sem
+    GROUP BY em ratings.
+    """
+    return Recipe.objects.select_related('author').prefetch_related('images')
+
+
+def _serialize(recipes):
+    return RecipeSummarySerializer(recipes, many=True).data
+
+
+def build_featured():
+    return _serialize(featured_queryset(summary_queryset())[:FEATURED_LIMIT])
+
+
+def build_trending():
+    return _serialize(trending_queryset(summary_queryset())[:TRENDING_LIMIT])
+
+
+def build_new():
+    return _serialize(summary_queryset().order_by('-created_at')[:NEW_LIMIT])
+
+
+def build_categories():
+    return get_compiled_taxonomy().data
+
+
+SECTIONS = {
+    'featured': build_featured,
+    'trending': build_trending,
+    'new': build_new,
+    'categories': build_categories,
+}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = getattr(settings, 'HOME_BUNDLE_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='home-bundle')
+    return _executor
+
+
+def _build_in_thread(builder):
+    # Mesmo ciclo de request_started/request_finished: a conexão da thread é
+    # reaproveitada e só fecha quando expira ou fica inutilizável
+    close_old_connections()
+    try:
+        return builder()
+    finally:
+        close_old_connections()
+
+
+def _build_sections(names):
+    workers = getattr(settings, 'HOME_BUNDLE_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+    if len(names) <= 1 or workers <= 1:
+        return {name: SECTIONS[name]() for name in names}
+
+    executor = _get_executor()
+    futures = {name: executor.submit(_build_in_thread, SECTIONS[name]) for name in names}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def get_home_bundle():
+    """Retorna todas as seções da página inicial, usando o cache por seção"""
+    keys = {name: SECTION_CACHE_PREFIX + name for name in SECTIONS}
+    cached = cache.get_many(keys.values())
+
+    bundle = {}
+    missing = []
+    for name, key in keys.items():
+        if key in cached:
+            bundle[name] = cached[key]
+        else:
+            missing.append(name)
+
+    if missing:
+        built = _build_sections(missing)
+        ttl = getattr(settings, 'HOME_SECTION_TTL', DEFAULT_SECTION_TTL)
+        cache.set_many({keys[name]: data for name, data in built.items()}, ttl)
+        bundle.update(built)
+        logger.debug(f"Seções da página inicial recalculadas: {', '.join(missing)}")
+
+    return {name: bundle[name] for name in SECTIONS}
+
+
+def invalidate_home_sections():
+    cache.delete_many([SECTION_CACHE_PREFIX + name for name in SECTIONS])
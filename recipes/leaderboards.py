@@ -0,0 +1,72 @@
+"""
+Rankings das receitas mais bem avaliadas por recipe_class e por style.
+
+A ordenação usa Recipe.bayesian_rating, que só é recalculada para a receita
+avaliada. Cada ranking é uma lista pequena [(id, pontuação), ...] no cache,
+montada por uma consulta limitada pelo índice (campo, -bayesian_rating).
+Uma avaliação descarta as listas da classe e do estilo da receita, e a
+próxima leitura as reconstrói; a lista em cache nunca é alterada no lugar,
+então avaliações simultâneas não sobrescrevem umas às outras.
+
+Nos outros workers a lista antiga vale até LEADERBOARD_TTL (veja a nota sobre
+CACHES em backend/settings.py).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Recipe, RECIPE_CLASS_CHOICES, STYLE_CHOICES, bayesian_rating_score
+
+LEADERBOARD_FIELDS = {
+    'recipe_class': RECIPE_CLASS_CHOICES,
+    'style': STYLE_CHOICES,
+}
+LEADERBOARD_SIZE = 20
+LEADERBOARD_TTL = 60  # curto, veja CACHES em backend/settings.py
+
+DEFAULT_PRIOR_MEAN = 7.0
+DEFAULT_PRIOR_WEIGHT = 10
+
+
+def compute_bayesian_rating(counts):
+    return bayesian_rating_score(
+        counts,
+        getattr(settings, 'RATING_PRIOR_MEAN', DEFAULT_PRIOR_MEAN),
+        getattr(settings, 'RATING_PRIOR_WEIGHT', DEFAULT_PRIOR_WEIGHT),
+    )
+
+
+def _key(field, value):
+    return f'leaderboard:{field}:{value}'
+
+
+def _rebuild(field, value):
+    entries = list(
+        Recipe.objects.filter(**{field: value}, bayesian_rating__gt=0)
+        .order_by('-bayesian_rating', 'id')
+        .values_list('id', 'bayesian_rating')[:LEADERBOARD_SIZE]
+    )
+    cache.set(_key(field, value), entries, LEADERBOARD_TTL)
+    return entries
+
+
+def get_leaderboard(field, value):
+    """Retorna [(id, pontuação), ...] em ordem decrescente"""
+    if field not in LEADERBOARD_FIELDS:
+        raise ValueError(f'Ranking não suportado para o campo {field}')
+    entries = cache.get(_key(field, value))
+    if entries is None:
+        entries = _rebuild(field, value)
+    return entries
+
+
+def invalidate_leaderboards(recipe):
+    """Descarta os rankings da classe e do estilo da receita (reconstruídos na próxima leitura)"""
+    cache.delete_many([_key(field, getattr(recipe, field)) for field in LEADERBOARD_FIELDS])
+
+
+def invalidate_all_leaderboards():
+    cache.delete_many([
+        _key(field, value)
+        for field, choices in LEADERBOARD_FIELDS.items()
+        for value, _ in choices
+    ])
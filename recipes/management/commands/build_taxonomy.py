@@ -0,0 +1,35 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+
+from recipes.taxonomy import CompiledTaxonomy, build_taxonomy, prebuilt_taxonomy_path
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera static/taxonomy.json a partir das choices do modelo Recipe. '
+        'Deve rodar antes do collectstatic para que o whitenoise sirva o arquivo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-counts', action='store_true',
+            help='Não consultar o banco de dados para as contagens por valor',
+        )
+
+    def handle(self, *args, **options):
+        with_counts = not options['no_counts']
+        try:
+            data = build_taxonomy(with_counts=with_counts)
+        except DatabaseError as e:
+            self.stderr.write(f'Banco de dados indisponível ({e}); gerando taxonomia sem contagens')
+            data = build_taxonomy(with_counts=False)
+
+        taxonomy = CompiledTaxonomy(data)
+        path = prebuilt_taxonomy_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(taxonomy.body)
+
+        self.stdout.write(self.style.SUCCESS(f'Taxonomia gerada em {path} (ETag {taxonomy.etag})'))
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.ratings import DEFAULT_HISTORY_BATCH_SIZE, compact_rating_history
+
+
+class Command(BaseCommand):
+    help = (
+        'Compacta o histórico de avaliações mais antigo que o período de retenção '
+        'em resumos diários por receita e apaga as linhas originais em lotes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'RATING_HISTORY_RETENTION_DAYS', 90),
+            help='Manter o histórico completo dos últimos N dias',
+        )
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_HISTORY_BATCH_SIZE)
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Interromper depois de N lotes (o restante fica para a próxima execução)',
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        compacted = compact_rating_history(
+            before, batch_size=options['batch_size'], max_batches=options['max_batches']
+        )
+        self.stdout.write(self.style.SUCCESS(f'{compacted} registros de histórico compactados'))
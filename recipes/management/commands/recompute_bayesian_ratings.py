@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from recipes.leaderboards import compute_bayesian_rating, invalidate_all_leaderboards
+from recipes.models import Recipe, unpack_rating_histogram
+from recipes.ratings import rebuild_rating_histograms
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula Recipe.bayesian_rating a partir dos histogramas de notas. '
+        'Necessário apenas depois de alterar RATING_PRIOR_MEAN ou RATING_PRIOR_WEIGHT. '
+        'Com --rebuild-histograms recalcula antes os histogramas a partir de Rating.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--rebuild-histograms', action='store_true',
+            help='Recalcula os histogramas a partir das avaliações (corrige exclusões feitas direto no banco)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['rebuild_histograms']:
+            updated = rebuild_rating_histograms(batch_size)
+            invalidate_all_leaderboards()
+            self.stdout.write(self.style.SUCCESS(f'{updated} histogramas corrigidos'))
+            return
+
+        updated = 0
+        batch = []
+        rows = Recipe.objects.order_by('pk').values_list('pk', 'rating_histogram', 'bayesian_rating')
+        for pk, histogram, current in rows.iterator(chunk_size=batch_size):
+            score = compute_bayesian_rating(unpack_rating_histogram(histogram))
+            if score != current:
+                batch.append(Recipe(pk=pk, bayesian_rating=score))
+            if len(batch) >= batch_size:
+                updated += Recipe.objects.bulk_update(batch, ['bayesian_rating'])
+                batch = []
+        if batch:
+            updated += Recipe.objects.bulk_update(batch, ['bayesian_rating'])
+
+        invalidate_all_leaderboards()
+        self.stdout.write(self.style.SUCCESS(f'{updated} receitas atualizadas'))
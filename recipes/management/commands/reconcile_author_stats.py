@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.authors import reconcile_author_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula AuthorStats a partir de Recipe e Rating e corrige as linhas divergentes. '
+        'Deve rodar periodicamente (ex.: uma vez por dia).'
+    )
+
+    def handle(self, *args, **options):
+        created, updated = reconcile_author_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'{created} autores incluídos, {updated} corrigidos'
+        ))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.rollups import flush_activity, rollup_visitor_periods
+
+
+class Command(BaseCommand):
+    help = 'Combina os esboços diários de visitantes únicos em totais semanais e mensais'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=1,
+            help='Recalcular os períodos das receitas com atividade nos últimos N dias',
+        )
+
+    def handle(self, *args, **options):
+        flush_activity()
+        since = timezone.localdate() - timedelta(days=options['days'])
+        written = rollup_visitor_periods(since=since)
+        self.stdout.write(self.style.SUCCESS(f'{written} períodos de visitantes únicos atualizados'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import update_trending_scores
+
+
+class Command(BaseCommand):
+    help = 'Atualiza de forma incremental a pontuação de tendência das receitas'
+
+    def handle(self, *args, **options):
+        recalculated, decayed = update_trending_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Tendências atualizadas: {recalculated} receitas recalculadas, {decayed} apenas decaídas'
+        ))
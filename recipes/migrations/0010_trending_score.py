@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 18:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_fix_field_rename_conflict'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('ratings_count', models.PositiveIntegerField(default=0)),
+                ('ratings_sum', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_day',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['recipe_class', '-trending_score'], name='recipe_class_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='recipedailystats',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='recipes.recipe'),
+        ),
+        migrations.AddIndex(
+            model_name='recipedailystats',
+            index=models.Index(fields=['day'], name='recipes_rec_day_04f759_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipedailystats',
+            unique_together={('recipe', 'day')},
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-19 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipedailystats',
+            name='unique_visitors',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipedailystats',
+            name='visitors_sketch',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RecipeVisitorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('WEEK', 'Semana'), ('MONTH', 'Mês')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('visitors_sketch', models.BinaryField(blank=True, null=True)),
+                ('unique_visitors', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visitor_rollups', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start'], name='recipes_rec_period_b9dd46_idx')],
+                'unique_together': {('recipe', 'period', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 18:41
+
+import recipes.models
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_rating_histograms(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Rating = apps.get_model('recipes', 'Rating')
+
+    histograms = {}
+    rows = Rating.objects.values('recipe_id', 'score').annotate(total=Count('id')).order_by()
+    for row in rows:
+        counts = histograms.setdefault(row['recipe_id'], [0] * 10)
+        if 1 <= row['score'] <= 10:
+            counts[row['score'] - 1] = row['total']
+
+    for recipe_id, counts in histograms.items():
+        Recipe.objects.filter(pk=recipe_id).update(
+            rating_histogram=recipes.models.pack_rating_histogram(counts)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_unique_visitor_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_histogram',
+            field=models.BinaryField(default=recipes.models.empty_rating_histogram),
+        ),
+        migrations.RunPython(populate_rating_histograms, migrations.RunPython.noop),
+    ]
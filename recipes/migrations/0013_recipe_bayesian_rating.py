@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-19 18:45
+
+import recipes.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_bayesian_ratings(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    prior_mean = getattr(settings, 'RATING_PRIOR_MEAN', 7.0)
+    prior_weight = getattr(settings, 'RATING_PRIOR_WEIGHT', 10)
+
+    updated = []
+    for recipe in Recipe.objects.only('pk', 'rating_histogram').iterator():
+        counts = recipes.models.unpack_rating_histogram(recipe.rating_histogram)
+        if sum(counts):
+            recipe.bayesian_rating = recipes.models.bayesian_rating_score(counts, prior_mean, prior_weight)
+            updated.append(recipe)
+    Recipe.objects.bulk_update(updated, ['bayesian_rating'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_rating_histogram'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='bayesian_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['recipe_class', '-bayesian_rating'], name='recipe_class_bayesian_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['style', '-bayesian_rating'], name='recipe_style_bayesian_idx'),
+        ),
+        migrations.RunPython(populate_bayesian_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-19 18:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_bayesian_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingHistorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.PositiveIntegerField(default=0)),
+                ('min_score', models.PositiveSmallIntegerField()),
+                ('max_score', models.PositiveSmallIntegerField()),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='ratinghistory',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='ratinghistory',
+            index=models.Index(fields=['rating', 'created_at'], name='rating_history_rating_idx'),
+        ),
+        migrations.AddField(
+            model_name='ratinghistorysummary',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_history_summaries', to='recipes.recipe'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ratinghistorysummary',
+            unique_together={('recipe', 'day')},
+        ),
+    ]
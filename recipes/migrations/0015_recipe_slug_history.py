@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_rating_history_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSlugHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=255, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slug_history', to='recipes.recipe')),
+            ],
+        ),
+    ]
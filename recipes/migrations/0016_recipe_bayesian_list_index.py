@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 18:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_slug_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-bayesian_rating', '-id'], name='recipe_bayesian_list_idx'),
+        ),
+    ]
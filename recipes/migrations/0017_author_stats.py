@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 19:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_author_stats(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Rating = apps.get_model('recipes', 'Rating')
+    AuthorStats = apps.get_model('recipes', 'AuthorStats')
+
+    stats = {}
+    rows = Recipe.objects.order_by().values('author_id')\
+        .annotate(recipes_count=Count('id'), total_views=Sum('views_count'))
+    for row in rows:
+        stats[row['author_id']] = AuthorStats(
+            author_id=row['author_id'], recipes_count=row['recipes_count'], total_views=row['total_views'] or 0,
+        )
+    rows = Rating.objects.order_by().values('recipe__author_id')\
+        .annotate(ratings_count=Count('id'), ratings_sum=Sum('score'))
+    for row in rows:
+        author_stats = stats.setdefault(row['recipe__author_id'], AuthorStats(author_id=row['recipe__author_id']))
+        author_stats.ratings_count = row['ratings_count']
+        author_stats.ratings_sum = row['ratings_sum'] or 0
+    AuthorStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0016_recipe_bayesian_list_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipes_count', models.PositiveIntegerField(default=0)),
+                ('total_views', models.PositiveBigIntegerField(default=0)),
+                ('ratings_count', models.PositiveIntegerField(default=0)),
+                ('ratings_sum', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_views', 'author'], name='author_stats_top_idx')],
+            },
+        ),
+        migrations.RunPython(populate_author_stats, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.validators import MinLengthValidator, MaxLengthValidator
@@ -7,6 +7,8 @@ from core.validators import validate_image, validate_youtube_link
 from django.utils import timezone
 from django.utils.text import slugify
 import os
+import re
+import struct
 from uuid import uuid4
 from cloudinary.models import CloudinaryField
 
@@ -36,6 +38,119 @@ NUTRITIONAL_LEVEL_CHOICES = [
     ('ALTO', 'Alto'),
 ]
 
+RATING_HISTOGRAM = struct.Struct('<10I')
+
+
+def empty_rating_histogram():
+    return RATING_HISTOGRAM.pack(*([0] * 10))
+
+
+def unpack_rating_histogram(data):
+    """Converte o campo compactado em uma lista com a quantidade de notas 1..10"""
+    if not data:
+        return [0] * 10
+    return list(RATING_HISTOGRAM.unpack(bytes(data)))
+
+
+def pack_rating_histogram(counts):
+    return RATING_HISTOGRAM.pack(*counts)
+
+
+def bayesian_rating_score(counts, prior_mean, prior_weight):
+    """
+    Média amortecida: (prior_weight * prior_mean + soma das notas) / (prior_weight + total).
+
+    Receitas com poucas avaliações ficam próximas da média a priori. Sem
+    avaliações a pontuação é 0, para que não entrem nos rankings.
+    """
+    total = sum(counts)
+    if not total:
+        return 0
+    score_sum = sum(score * count for score, count in enumerate(counts, start=1))
+    return (prior_weight * prior_mean + score_sum) / (prior_weight + total)
+
+
+def rating_histogram_stats(counts):
+    """Retorna (média, total) a partir das contagens por nota"""
+    total = sum(counts)
+    if not total:
+        return 0, 0
+    return sum(score * count for score, count in enumerate(counts, start=1)) / total, total
+
+
+SLUG_ALLOCATION_ATTEMPTS = 5
+
+
+def slug_base(title):
+    return slugify(title) or 'receita'
+
+
+class RecipeManager(models.Manager):
+    def allocate_slugs(self, bases, recipe=None):
+        """
+        Retorna um slug livre para cada base, na mesma ordem, com uma única consulta.
+
+        A consulta busca a base e seus sufixos numéricos (slug = base ou
+        slug LIKE 'base-%' com o resto só de dígitos): o prefixo usa os índices
+        de slug das receitas e do histórico de slugs, e a expressão regular
+        descarta slugs de outros títulos com o mesmo começo (bolo-de-cenoura-com-...).
+        O próximo sufixo livre é escolhido em Python. Bases repetidas recebem
+        sufixos diferentes (bolo, bolo-1, bolo-2...).
+
+        Com recipe, os slugs da própria receita (atual e antigos) não contam
+        como ocupados, para que ela possa voltar a um título anterior.
+        """
+        if not bases:
+            return []
+        query = models.Q()
+        for base in set(bases):
+            query |= models.Q(slug=base) | models.Q(
+                slug__startswith=f'{base}-', slug__regex=rf'^{re.escape(base)}-[0-9]+$'
+            )
+        recipes = self.filter(query)
+        history = RecipeSlugHistory.objects.filter(query)
+        if recipe is not None and recipe.pk is not None:
+            recipes = recipes.exclude(pk=recipe.pk)
+            history = history.exclude(recipe_id=recipe.pk)
+        # Slugs antigos de receitas renomeadas também ficam reservados
+        taken = set(
+            recipes.values_list('slug', flat=True).union(history.values_list('slug', flat=True))
+        )
+
+        slugs = []
+        for base in bases:
+            slug = base
+            counter = 1
+            while slug in taken:
+                slug = f'{base}-{counter}'
+                counter += 1
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # Gerar os slugs que faltam para todas as receitas de uma vez
+        objs = list(objs)
+        pending = [obj for obj in objs if not obj.slug]
+        slugs = self.allocate_slugs([slug_base(obj.title) for obj in pending])
+        for obj, slug in zip(pending, slugs):
+            obj.slug = slug
+        created = super().bulk_create(objs, *args, **kwargs)
+
+        # bulk_create não dispara post_save: limpar slugs guardados como
+        # inexistentes, somar as receitas ao AuthorStats e descartar os perfis
+        from .authors import recipes_bulk_created
+        from .profiles import invalidate_author_profile
+        from .slugs import invalidate_slugs
+        invalidate_slugs(*(obj.slug for obj in objs))
+        recipes_bulk_created(
+            objs, conflicts=kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts')
+        )
+        for author_id in {obj.author_id for obj in objs}:
+            invalidate_author_profile(author_id)
+        return created
+
+
 class Recipe(models.Model):
     title = models.CharField(
         max_length=200,
@@ -85,6 +200,15 @@ class Recipe(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     views_count = models.IntegerField(default=0)
     is_featured = models.BooleanField(default=False)
+    # Pontuação de tendência com decaimento exponencial (ver recipes.trending)
+    trending_score = models.FloatField(default=0, db_index=True)
+    trending_day = models.DateField(blank=True, null=True)
+    # Quantidade de notas de 1 a 10, compactada em 10 inteiros de 32 bits
+    rating_histogram = models.BinaryField(default=empty_rating_histogram)
+    # Média bayesiana recalculada a cada avaliação (ver recipes.leaderboards)
+    bayesian_rating = models.FloatField(default=0)
+
+    objects = RecipeManager()
 
     class Meta:
         indexes = [
@@ -93,37 +217,96 @@ class Recipe(models.Model):
             models.Index(fields=['genre']),
             models.Index(fields=['nutritional_level']),
             models.Index(fields=['traditional']),
+            models.Index(fields=['recipe_class', '-trending_score'], name='recipe_class_trending_idx'),
+            models.Index(fields=['recipe_class', '-bayesian_rating'], name='recipe_class_bayesian_idx'),
+            models.Index(fields=['style', '-bayesian_rating'], name='recipe_style_bayesian_idx'),
+            models.Index(fields=['-bayesian_rating', '-id'], name='recipe_bayesian_list_idx'),
         ]
 
     def __str__(self):
         return self.title
 
+    def rating_distribution(self):
+        return unpack_rating_histogram(self.rating_histogram)
+
     def average_rating(self):
-        ratings = self.ratings.all()
-        if not ratings:
-            return 0
-        return sum(r.score for r in ratings) / len(ratings)
+        return rating_histogram_stats(self.rating_distribution())[0]
 
     def total_ratings(self):
-        return self.ratings.count()
+        return sum(self.rating_distribution())
+
+    def increment_views(self, visitor=None):
+        # O incremento no banco é feito em lote por recipes.rollups
+        from .rollups import record_view
 
-    def increment_views(self):
         self.views_count += 1
-        self.save(update_fields=['views_count'])
+        record_view(self.pk, visitor)
         
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Título e slug carregados, para detectar renomeações em save()
+        instance._loaded_title = instance.__dict__.get('title')
+        instance._loaded_slug = instance.__dict__.get('slug')
+        return instance
+
+    def _renamed_slug(self):
+        """Slug antigo, se o título mudou a ponto de gerar outro slug"""
+        loaded_title = getattr(self, '_loaded_title', None)
+        loaded_slug = getattr(self, '_loaded_slug', None)
+        if self._state.adding or loaded_title is None or not loaded_slug:
+            return None
+        if self.slug != loaded_slug or slug_base(self.title) == slug_base(loaded_title):
+            return None
+        return loaded_slug
+
     def save(self, *args, **kwargs):
-        # Gerar slug a partir do título se não existir
-        if not self.slug:
-            self.slug = slugify(self.title)
-            
-            # Verificar se o slug já existe e adicionar um sufixo se necessário
-            original_slug = self.slug
-            counter = 1
-            while Recipe.objects.filter(slug=self.slug).exists():
-                self.slug = f"{original_slug}-{counter}"
-                counter += 1
-                
-        super().save(*args, **kwargs)
+        previous_slug = self._renamed_slug()
+        if previous_slug:
+            self.slug = ''
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'slug'}
+        self._previous_slug = previous_slug
+
+        if self.slug:
+            super().save(*args, **kwargs)
+            self._loaded_title, self._loaded_slug = self.title, self.slug
+            return
+
+        # Gerar slug a partir do título, com o próximo sufixo livre
+        base = slug_base(self.title)
+        for attempt in range(SLUG_ALLOCATION_ATTEMPTS):
+            self.slug = Recipe.objects.allocate_slugs([base], recipe=self)[0]
+            try:
+                # Outra requisição pode ocupar o mesmo slug entre a consulta e o INSERT
+                with transaction.atomic():
+                    if previous_slug:
+                        # Voltando a um título anterior: o slug sai do histórico
+                        RecipeSlugHistory.objects.filter(slug=self.slug, recipe=self).delete()
+                    super().save(*args, **kwargs)
+                    if previous_slug:
+                        # O endereço antigo continua funcionando com um redirecionamento
+                        RecipeSlugHistory.objects.update_or_create(
+                            slug=previous_slug, defaults={'recipe': self}
+                        )
+                self._loaded_title, self._loaded_slug = self.title, self.slug
+                return
+            except IntegrityError:
+                slug_taken = Recipe.objects.filter(slug=self.slug).exists()
+                self.slug = previous_slug or ''
+                if not slug_taken or attempt == SLUG_ALLOCATION_ATTEMPTS - 1:
+                    raise
+                self.slug = ''
+
+
+class RecipeSlugHistory(models.Model):
+    """Slugs antigos de receitas renomeadas, respondidos com 301 para o slug atual"""
+    recipe = models.ForeignKey(Recipe, related_name='slug_history', on_delete=models.CASCADE)
+    slug = models.SlugField(max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.slug} -> {self.recipe.slug}'
 
 class Rating(models.Model):
     recipe = models.ForeignKey(Recipe, related_name='ratings', on_delete=models.CASCADE)
@@ -137,6 +320,14 @@ class Rating(models.Model):
     def __str__(self):
         return f"{self.user.username}'s rating for {self.recipe.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Receita e nota carregadas, para ajustar o histograma em edições (recipes.ratings.rating_saved)
+        instance._loaded_recipe_id = instance.__dict__.get('recipe_id')
+        instance._loaded_score = instance.__dict__.get('score')
+        return instance
+
     def clean(self):
         if self.score < 1 or self.score > 10:
             raise ValidationError('A nota deve estar entre 1 e 10')
@@ -145,9 +336,99 @@ class RatingHistory(models.Model):
     rating = models.ForeignKey(Rating, on_delete=models.CASCADE, related_name='history')
     score = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rating', 'created_at'], name='rating_history_rating_idx'),
+        ]
+
+
+class RatingHistorySummary(models.Model):
+    """Resumo diário por receita do histórico compactado (ver compact_rating_history)"""
+    recipe = models.ForeignKey(Recipe, related_name='rating_history_summaries', on_delete=models.CASCADE)
+    day = models.DateField()
+    entries = models.PositiveIntegerField(default=0)
+    score_sum = models.PositiveIntegerField(default=0)
+    min_score = models.PositiveSmallIntegerField()
+    max_score = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ['recipe', 'day']
+
+    def __str__(self):
+        return f'{self.recipe.title} - {self.day}: {self.entries} registros'
+
+
+class RecipeDailyStats(models.Model):
+    """Contadores diários de atividade por receita (visualizações e avaliações)"""
+    recipe = models.ForeignKey(Recipe, related_name='daily_stats', on_delete=models.CASCADE)
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    ratings_count = models.PositiveIntegerField(default=0)
+    ratings_sum = models.PositiveIntegerField(default=0)
+    # Esboço HyperLogLog dos visitantes do dia (ver recipes.hll) e sua estimativa
+    visitors_sketch = models.BinaryField(blank=True, null=True)
+    unique_visitors = models.PositiveIntegerField(default=0)
+
     class Meta:
-        ordering = ['-created_at']
+        unique_together = ['recipe', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} em {self.day}"
+
+class RecipeVisitorRollup(models.Model):
+    """Visitantes únicos por semana ou mês, combinados a partir dos esboços diários"""
+    PERIOD_CHOICES = [
+        ('WEEK', 'Semana'),
+        ('MONTH', 'Mês'),
+    ]
+
+    recipe = models.ForeignKey(Recipe, related_name='visitor_rollups', on_delete=models.CASCADE)
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    visitors_sketch = models.BinaryField(blank=True, null=True)
+    unique_visitors = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['recipe', 'period', 'period_start']
+        indexes = [
+            models.Index(fields=['period', 'period_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} {self.period} {self.period_start}"
+
+class AuthorStats(models.Model):
+    """
+    Totais por autor mantidos incrementalmente (ver recipes.authors).
+
+    Atualizados na criação e exclusão de receitas, na gravação das
+    visualizações em lote e em cada avaliação; reconcile_author_stats corrige
+    desvios periodicamente.
+    """
+    author = models.OneToOneField(User, primary_key=True, related_name='author_stats', on_delete=models.CASCADE)
+    recipes_count = models.PositiveIntegerField(default=0)
+    total_views = models.PositiveBigIntegerField(default=0)
+    ratings_count = models.PositiveIntegerField(default=0)
+    ratings_sum = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Ranking de autores mais vistos
+            models.Index(fields=['-total_views', 'author'], name='author_stats_top_idx'),
+        ]
+
+    def average_rating(self):
+        return round(self.ratings_sum / self.ratings_count, 2) if self.ratings_count else 0
+
+    def __str__(self):
+        return f"Estatísticas de {self.author_id}"
 
 # RecipeTag foi removido conforme as instruções do documento
 
@@ -0,0 +1,59 @@
+"""
+Página pública de um autor montada em uma única requisição.
+
+Junta os dados do perfil, as estatísticas do autor (AuthorStats, ver
+recipes.authors) e a primeira página das suas receitas em formato
+compacto. O resultado inteiro fica em cache por autor e é descartado pelos
+signals quando o autor grava receitas ou o perfil (ver recipes.signals).
+
+O cache não depende do host da requisição: a imagem padrão do perfil é
+guardada com o caminho relativo e a URL absoluta é montada a cada resposta.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .authors import get_author_stats
+from .home import summary_queryset
+from .serializers import RecipeSummarySerializer
+from users.serializers import public_profile_data
+
+PROFILE_CACHE_PREFIX = 'author:profile:'
+DEFAULT_PROFILE_TTL = 300
+DEFAULT_PAGE_SIZE = 12
+
+
+def _cache_key(author_id):
+    return f'{PROFILE_CACHE_PREFIX}{author_id}'
+
+
+def build_author_profile(user):
+    page_size = getattr(settings, 'AUTHOR_PROFILE_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    stats = get_author_stats(user.pk)
+    recipes = summary_queryset().filter(author_id=user.pk).order_by('-created_at', '-id')[:page_size]
+    total = stats['recipes_count']
+    return {
+        'profile': public_profile_data(user),
+        'stats': stats,
+        'recipes': {
+            'results': RecipeSummarySerializer(recipes, many=True).data,
+            'count': total,
+            'total_pages': max(1, -(-total // page_size)),
+            'current_page': 1,
+        },
+    }
+
+
+def get_author_profile(user, request):
+    """Retorna a página do autor, usando o cache por autor"""
+    key = _cache_key(user.pk)
+    data = cache.get(key)
+    if data is None:
+        data = build_author_profile(user)
+        cache.set(key, data, getattr(settings, 'AUTHOR_PROFILE_CACHE_TTL', DEFAULT_PROFILE_TTL))
+    # URLs já absolutas (Cloudinary) voltam sem alteração
+    profile = dict(data['profile'], profileImage=request.build_absolute_uri(data['profile']['profileImage']))
+    return dict(data, profile=profile)
+
+
+def invalidate_author_profile(author_id):
+    cache.delete(_cache_key(author_id))
@@ -0,0 +1,22 @@
+"""
+Planos de consulta compartilhados para carregar receitas completas.
+
+As médias vêm do histograma desnormalizado (Recipe.average_rating()), então
+nenhum plano daqui faz GROUP BY em ratings.
+"""
+from .models import Recipe
+
+
+def detail_queryset(fields=None):
+    """
+    Receitas prontas para o RecipeSerializer, sem consultas por receita.
+
+    Com fields (lista de campos do serializer), carrega apenas as relações
+    necessárias para esses campos.
+    """
+    queryset = Recipe.objects.all()
+    if fields is None or 'author' in fields:
+        queryset = queryset.select_related('author', 'author__profile')
+    if fields is None or 'images' in fields or 'image_url' in fields:
+        queryset = queryset.prefetch_related('images')
+    return queryset
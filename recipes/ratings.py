@@ -0,0 +1,280 @@
+"""
+Serviço de avaliações.
+
+save_rating grava, em uma única transação, a avaliação, o histórico
+(RatingHistory), o histograma de notas com a média bayesiana da receita e as
+estatísticas do autor. A linha da receita fica bloqueada durante a transação,
+o que serializa avaliações simultâneas da mesma receita.
+
+- PostgreSQL: SELECT ... FOR UPDATE do histograma; um único comando grava a
+  avaliação (INSERT ... ON CONFLICT DO UPDATE) e o histórico em CTEs e
+  devolve a nota anterior; por fim, um UPDATE do histograma.
+- Outros bancos: o mesmo fluxo com bulk_create(update_conflicts=True), que
+  também gera INSERT ... ON CONFLICT DO UPDATE, e o histórico em um INSERT
+  separado. O SQLite ignora FOR UPDATE; a serialização vem do
+  transaction_mode IMMEDIATE configurado em settings.
+
+Como a inserção nunca falha por conflito, cliques duplos simultâneos não
+geram IntegrityError.
+
+rating_saved e rating_deleted (chamados pelos signals de Rating) aplicam ao
+histograma as avaliações gravadas ou apagadas fora de save_rating (admin,
+Rating.objects.create, exclusão em cascata do usuário); save_rating não
+dispara esses signals porque grava com bulk_create e SQL direto. rebuild_rating_histograms
+recalcula os histogramas a partir de Rating e corrige os que divergirem.
+
+compact_rating_history aplica a política de retenção do histórico: linhas
+mais antigas que o limite viram resumos diários por receita
+(RatingHistorySummary) e são apagadas em lotes curtos, cada um em sua
+própria transação, para não manter bloqueios longos.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import (
+    Rating, RatingHistory, RatingHistorySummary, Recipe,
+    pack_rating_histogram, unpack_rating_histogram, rating_histogram_stats
+)
+from .authors import adjust_author_stats
+from .leaderboards import compute_bayesian_rating, invalidate_leaderboards
+from .profiles import invalidate_author_profile
+from .rollups import record_rating
+
+RatingResult = namedtuple('RatingResult', [
+    'rating', 'created', 'previous_score',
+    'average_rating', 'total_ratings', 'distribution',
+])
+
+
+def _upsert_postgresql(recipe_id, user_id, score, now):
+    rating_table = connection.ops.quote_name(Rating._meta.db_table)
+    history_table = connection.ops.quote_name(RatingHistory._meta.db_table)
+    sql = f"""
+        WITH previous AS (
+            SELECT score FROM {rating_table} WHERE recipe_id = %s AND user_id = %s
+        ), upserted AS (
+            INSERT INTO {rating_table} (recipe_id, user_id, score, created_at)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (recipe_id, user_id) DO UPDATE SET score = EXCLUDED.score
+            RETURNING id, created_at
+        ), history AS (
+            INSERT INTO {history_table} (rating_id, score, created_at)
+            SELECT id, %s, %s FROM upserted
+        )
+        SELECT upserted.id, upserted.created_at, (SELECT score FROM previous) FROM upserted
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [recipe_id, user_id, recipe_id, user_id, score, now, score, now])
+        return cursor.fetchone()
+
+
+def _upsert_generic(recipe_id, user_id, score, now):
+    previous = Rating.objects.filter(recipe_id=recipe_id, user_id=user_id)\
+        .values_list('score', flat=True).first()
+    rating = Rating(recipe_id=recipe_id, user_id=user_id, score=score, created_at=now)
+    Rating.objects.bulk_create(
+        [rating],
+        update_conflicts=True,
+        unique_fields=['recipe', 'user'],
+        update_fields=['score'],
+    )
+    # Em conflito o objeto não reflete a linha existente: buscar id e data originais
+    rating_id, created_at = Rating.objects.filter(recipe_id=recipe_id, user_id=user_id)\
+        .values_list('pk', 'created_at').get()
+    RatingHistory.objects.create(rating_id=rating_id, score=score)
+    return rating_id, created_at, previous
+
+
+def save_rating(recipe, user, score):
+    """
+    Cria ou atualiza a avaliação do usuário e devolve os agregados atualizados.
+
+    Retorna um RatingResult com a avaliação, se ela foi criada, a nota
+    anterior e a média, o total e a distribuição já recalculados.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        histogram = Recipe.objects.select_for_update()\
+            .values_list('rating_histogram', flat=True).get(pk=recipe.pk)
+
+        if connection.vendor == 'postgresql':
+            rating_id, created_at, previous = _upsert_postgresql(recipe.pk, user.pk, score, now)
+        else:
+            rating_id, created_at, previous = _upsert_generic(recipe.pk, user.pk, score, now)
+
+        counts = unpack_rating_histogram(histogram)
+        if previous is not None:
+            counts[previous - 1] -= 1
+        counts[score - 1] += 1
+        recipe.rating_histogram = pack_rating_histogram(counts)
+        recipe.bayesian_rating = compute_bayesian_rating(counts)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            rating_histogram=recipe.rating_histogram,
+            bayesian_rating=recipe.bayesian_rating,
+        )
+        adjust_author_stats(
+            [recipe.author_id],
+            ratings=1 if previous is None else 0,
+            ratings_sum=score - (previous or 0),
+        )
+
+    record_rating(recipe.pk, score)
+    invalidate_leaderboards(recipe)
+    invalidate_author_profile(recipe.author_id)
+
+    rating = Rating(id=rating_id, recipe=recipe, user=user, score=score, created_at=created_at)
+    average, total = rating_histogram_stats(counts)
+    return RatingResult(rating, previous is None, previous, average, total, counts)
+
+
+def _apply_score_change(recipe_id, removed=None, added=None):
+    """Tira a nota removed e soma a nota added no histograma da receita, com a linha bloqueada"""
+    with transaction.atomic():
+        row = Recipe.objects.select_for_update().filter(pk=recipe_id)\
+            .values_list('rating_histogram', 'author_id', 'recipe_class', 'style').first()
+        if row is None:
+            return
+        histogram, author_id, recipe_class, style = row
+        counts = unpack_rating_histogram(histogram)
+        if removed is not None:
+            if not counts[removed - 1]:
+                return  # histograma já divergente; rebuild_rating_histograms corrige
+            counts[removed - 1] -= 1
+        if added is not None:
+            counts[added - 1] += 1
+        Recipe.objects.filter(pk=recipe_id).update(
+            rating_histogram=pack_rating_histogram(counts),
+            bayesian_rating=compute_bayesian_rating(counts),
+        )
+        adjust_author_stats(
+            [author_id],
+            ratings=(added is not None) - (removed is not None),
+            ratings_sum=(added or 0) - (removed or 0),
+        )
+
+    invalidate_leaderboards(Recipe(pk=recipe_id, recipe_class=recipe_class, style=style))
+    invalidate_author_profile(author_id)
+
+
+def rating_saved(rating, created):
+    """Aplica ao histograma uma avaliação gravada fora de save_rating (admin, Rating.objects.create)"""
+    previous_recipe = getattr(rating, '_loaded_recipe_id', None)
+    previous_score = getattr(rating, '_loaded_score', None)
+    if created or previous_recipe is None:
+        _apply_score_change(rating.recipe_id, added=rating.score)
+    elif previous_recipe != rating.recipe_id:
+        _apply_score_change(previous_recipe, removed=previous_score)
+        _apply_score_change(rating.recipe_id, added=rating.score)
+    elif previous_score != rating.score:
+        _apply_score_change(rating.recipe_id, removed=previous_score, added=rating.score)
+    else:
+        return
+    RatingHistory.objects.create(rating=rating, score=rating.score)
+    record_rating(rating.recipe_id, rating.score)
+    rating._loaded_recipe_id, rating._loaded_score = rating.recipe_id, rating.score
+
+
+def rating_deleted(rating):
+    """Retira a nota de uma avaliação apagada do histograma e das estatísticas do autor"""
+    _apply_score_change(rating.recipe_id, removed=rating.score)
+
+
+def rebuild_rating_histograms(batch_size=500):
+    """
+    Recalcula rating_histogram e bayesian_rating a partir de Rating.
+
+    Corrige desvios de exclusões feitas direto no banco. Retorna a quantidade
+    de receitas corrigidas.
+    """
+    expected = {}
+    rows = Rating.objects.order_by().values_list('recipe_id', 'score').annotate(count=Count('id'))
+    for recipe_id, score, count in rows:
+        expected.setdefault(recipe_id, [0] * 10)[score - 1] = count
+
+    updated = 0
+    batch = []
+    recipes = Recipe.objects.order_by('pk').values_list('pk', 'rating_histogram', 'bayesian_rating')
+    for pk, histogram, current in recipes.iterator(chunk_size=batch_size):
+        counts = expected.get(pk, [0] * 10)
+        score = compute_bayesian_rating(counts)
+        if counts != unpack_rating_histogram(histogram) or score != current:
+            batch.append(Recipe(pk=pk, rating_histogram=pack_rating_histogram(counts), bayesian_rating=score))
+        if len(batch) >= batch_size:
+            updated += Recipe.objects.bulk_update(batch, ['rating_histogram', 'bayesian_rating'])
+            batch = []
+    if batch:
+        updated += Recipe.objects.bulk_update(batch, ['rating_histogram', 'bayesian_rating'])
+    return updated
+
+
+DEFAULT_HISTORY_BATCH_SIZE = 1000
+
+
+def _compact_history_batch(before, after_id, batch_size):
+    """Compacta um lote de até batch_size linhas; retorna (quantidade, último id)"""
+    with transaction.atomic():
+        rows = list(
+            RatingHistory.objects.filter(pk__gt=after_id, created_at__lt=before)
+            .order_by('pk')
+            .values_list('pk', 'rating__recipe_id', 'score', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return 0, after_id
+
+        totals = {}
+        for _, recipe_id, score, created_at in rows:
+            key = (recipe_id, timezone.localdate(created_at))
+            entries, score_sum, low, high = totals.get(key, (0, 0, score, score))
+            totals[key] = (entries + 1, score_sum + score, min(low, score), max(high, score))
+
+        existing = {
+            (summary.recipe_id, summary.day): summary
+            for summary in RatingHistorySummary.objects.select_for_update().filter(
+                recipe_id__in={recipe_id for recipe_id, _ in totals},
+                day__in={day for _, day in totals},
+            )
+        }
+        created, updated = [], []
+        for (recipe_id, day), (entries, score_sum, low, high) in totals.items():
+            summary = existing.get((recipe_id, day))
+            if summary is None:
+                created.append(RatingHistorySummary(
+                    recipe_id=recipe_id, day=day, entries=entries,
+                    score_sum=score_sum, min_score=low, max_score=high,
+                ))
+            else:
+                summary.entries += entries
+                summary.score_sum += score_sum
+                summary.min_score = min(summary.min_score, low)
+                summary.max_score = max(summary.max_score, high)
+                updated.append(summary)
+        RatingHistorySummary.objects.bulk_create(created)
+        RatingHistorySummary.objects.bulk_update(
+            updated, ['entries', 'score_sum', 'min_score', 'max_score']
+        )
+
+        ids = [row[0] for row in rows]
+        RatingHistory.objects.filter(pk__in=ids).delete()
+        return len(rows), ids[-1]
+
+
+def compact_rating_history(before, batch_size=DEFAULT_HISTORY_BATCH_SIZE, max_batches=None):
+    """
+    Resume e apaga o histórico de avaliações criado antes de before.
+
+    Percorre a tabela pela chave primária em lotes de batch_size linhas.
+    Retorna a quantidade de linhas compactadas.
+    """
+    compacted = 0
+    last_id = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count, last_id = _compact_history_batch(before, last_id, batch_size)
+        if not count:
+            break
+        compacted += count
+        batches += 1
+    return compacted
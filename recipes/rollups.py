@@ -0,0 +1,295 @@
+"""
+Agregados diários de visualizações e avaliações por receita.
+
+Os caminhos de escrita (visualização de receita e avaliação) não gravam no
+banco a cada evento: os contadores ficam em um buffer em memória do worker e
+são descarregados em lote por uma thread própria do processo, a cada
+ROLLUP_FLUSH_INTERVAL segundos ou assim que o buffer passa de
+ROLLUP_FLUSH_MAX_PENDING chaves. A descarga nunca roda na thread de uma
+requisição; se falhar, os eventos voltam para o buffer e entram na próxima.
+Cada descarga faz um UPDATE por receita/dia em RecipeDailyStats e agrupa os
+incrementos de views_count (e de AuthorStats.total_views).
+
+As visualizações também alimentam um esboço HyperLogLog por receita/dia com
+o identificador anônimo do visitante, combinado ao esboço gravado na descarga.
+
+Eventos ainda no buffer se perdem se o worker morrer antes da descarga; para
+análises e tendências essa perda é aceitável.
+"""
+import atexit
+import hashlib
+import hmac
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from backend.middleware import client_ip
+
+from .authors import add_views
+from .hll import HyperLogLog
+from .models import Recipe, RecipeDailyStats, RecipeVisitorRollup
+
+logger = logging.getLogger('django')
+
+DEFAULT_FLUSH_INTERVAL = 30
+DEFAULT_FLUSH_MAX_PENDING = 500
+
+
+def record_activity(recipe_id, views=0, ratings_count=0, ratings_sum=0, day=None, sketch=None):
+    """
+    Soma a atividade ao agregado do dia da receita, criando-o se necessário.
+
+    Sem esboço de visitantes o incremento é um único UPDATE com F(). Com
+    esboço, a linha é bloqueada para combinar o HyperLogLog armazenado.
+    """
+    day = day or timezone.localdate()
+    bucket = RecipeDailyStats.objects.filter(recipe_id=recipe_id, day=day)
+
+    if sketch is None:
+        increments = {
+            'views': F('views') + views,
+            'ratings_count': F('ratings_count') + ratings_count,
+            'ratings_sum': F('ratings_sum') + ratings_sum,
+        }
+        if bucket.update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                RecipeDailyStats.objects.create(
+                    recipe_id=recipe_id, day=day, views=views,
+                    ratings_count=ratings_count, ratings_sum=ratings_sum
+                )
+        except IntegrityError:
+            # Outro processo criou o agregado entre o UPDATE e o INSERT
+            bucket.update(**increments)
+        return
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                row = bucket.select_for_update().first()
+                if row is None:
+                    row = RecipeDailyStats(recipe_id=recipe_id, day=day)
+                elif row.visitors_sketch:
+                    sketch = HyperLogLog.from_bytes(row.visitors_sketch).merge(sketch)
+                row.views += views
+                row.ratings_count += ratings_count
+                row.ratings_sum += ratings_sum
+                row.visitors_sketch = sketch.to_bytes()
+                row.unique_visitors = sketch.count()
+                row.save()
+            return
+        except IntegrityError:
+            # Outro processo criou o agregado; a segunda tentativa encontra a linha
+            if attempt:
+                raise
+
+
+class ActivityBuffer:
+    """Buffer de eventos por (receita, dia), seguro entre threads do worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = defaultdict(self._new_bucket)
+        self._wake = threading.Event()
+        self._flusher = None
+        self._flusher_pid = None
+
+    @staticmethod
+    def _new_bucket():
+        # [views, ratings_count, ratings_sum, esboço de visitantes]
+        return [0, 0, 0, None]
+
+    def add(self, recipe_id, views=0, ratings_count=0, ratings_sum=0, visitor=None):
+        key = (recipe_id, timezone.localdate())
+        with self._lock:
+            bucket = self._buckets[key]
+            bucket[0] += views
+            bucket[1] += ratings_count
+            bucket[2] += ratings_sum
+            if visitor is not None:
+                if bucket[3] is None:
+                    bucket[3] = HyperLogLog()
+                bucket[3].add(visitor)
+            pending = len(self._buckets)
+        self._ensure_flusher()
+        if pending >= getattr(settings, 'ROLLUP_FLUSH_MAX_PENDING', DEFAULT_FLUSH_MAX_PENDING):
+            self._wake.set()
+
+    def _ensure_flusher(self):
+        # Threads não sobrevivem ao fork do gunicorn: uma por processo
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher = threading.Thread(target=self._run, name='rollup-flush', daemon=True)
+            self._flusher_pid = os.getpid()
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            interval = getattr(settings, 'ROLLUP_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+            self._wake.wait(interval)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                pass  # já registrado em flush; os eventos voltaram para o buffer
+
+    def _restore(self, buckets):
+        """Devolve ao buffer eventos de uma descarga que falhou"""
+        with self._lock:
+            for key, (views, ratings_count, ratings_sum, sketch) in buckets.items():
+                bucket = self._buckets[key]
+                bucket[0] += views
+                bucket[1] += ratings_count
+                bucket[2] += ratings_sum
+                if sketch is not None:
+                    if bucket[3] is None:
+                        bucket[3] = HyperLogLog()
+                    bucket[3].merge(sketch)
+
+    def drain(self):
+        with self._lock:
+            buckets, self._buckets = self._buckets, defaultdict(self._new_bucket)
+        return buckets
+
+    def flush(self):
+        """
+        Grava os eventos acumulados.
+
+        Retorna a quantidade de agregados gravados.
+        """
+        buckets = self.drain()
+        if not buckets:
+            return 0
+
+        try:
+            return self._write(buckets)
+        except Exception as e:
+            self._restore(buckets)
+            logger.error(f"Erro ao gravar agregados diários ({len(buckets)} devolvidos ao buffer): {str(e)}")
+            raise
+
+    def _write(self, buckets):
+        # Receitas excluídas desde o evento são descartadas
+        # (a FK é verificada só no COMMIT)
+        authors = dict(Recipe.objects.filter(pk__in={recipe_id for recipe_id, _ in buckets})
+                       .values_list('pk', 'author_id'))
+        buckets = {key: value for key, value in buckets.items() if key[0] in authors}
+
+        # Incrementos de views_count agrupados pelo valor do incremento
+        views_by_recipe = defaultdict(int)
+        for (recipe_id, _), (views, _, _, _) in buckets.items():
+            views_by_recipe[recipe_id] += views
+        recipes_by_increment = defaultdict(list)
+        views_by_author = defaultdict(int)
+        for recipe_id, views in views_by_recipe.items():
+            if views:
+                recipes_by_increment[views].append(recipe_id)
+                views_by_author[authors[recipe_id]] += views
+
+        with transaction.atomic():
+            for views, recipe_ids in recipes_by_increment.items():
+                Recipe.objects.filter(pk__in=recipe_ids).update(views_count=F('views_count') + views)
+            add_views(views_by_author)
+            for (recipe_id, day), (views, ratings_count, ratings_sum, sketch) in buckets.items():
+                record_activity(recipe_id, views, ratings_count, ratings_sum, day=day, sketch=sketch)
+        return len(buckets)
+
+
+activity_buffer = ActivityBuffer()
+
+
+def _flush_at_exit():
+    try:
+        activity_buffer.flush()
+    except Exception:
+        pass  # já registrado em flush
+
+
+atexit.register(_flush_at_exit)
+
+
+def visitor_id(request):
+    """
+    Identificador anônimo do visitante para a contagem de únicos.
+
+    Usa o id do usuário autenticado ou, para anônimos, IP do cliente (atrás do
+    proxy, via X-Forwarded-For) e User-Agent. O valor passa por um HMAC com a
+    SECRET_KEY para que nada identificável seja guardado.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        raw = f'user:{user.pk}'
+    else:
+        raw = f"anon:{client_ip(request)}:{request.META.get('HTTP_USER_AGENT', '')}"
+    return hmac.new(settings.SECRET_KEY.encode('utf-8'), raw.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def record_view(recipe_id, visitor=None):
+    # Sem identificador cada visualização conta como um visitante distinto
+    activity_buffer.add(recipe_id, views=1, visitor=visitor or uuid4().hex)
+
+
+def record_rating(recipe_id, score):
+    activity_buffer.add(recipe_id, ratings_count=1, ratings_sum=score)
+
+
+def flush_activity():
+    return activity_buffer.flush()
+
+
+def period_start(day, period):
+    if period == 'WEEK':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def rollup_visitor_periods(since=None, today=None):
+    """
+    Combina os esboços diários em totais semanais e mensais.
+
+    Só recalcula os períodos das receitas com atividade a partir de `since`
+    (por padrão, ontem). Retorna a quantidade de períodos gravados.
+    """
+    today = today or timezone.localdate()
+    since = since or today - timedelta(days=1)
+    active_ids = RecipeDailyStats.objects.filter(day__gte=since, day__lte=today)\
+        .values('recipe_id').distinct()
+
+    written = 0
+    for period, _ in RecipeVisitorRollup.PERIOD_CHOICES:
+        rows = RecipeDailyStats.objects.filter(
+            recipe_id__in=active_ids, day__gte=period_start(since, period), day__lte=today
+        ).values_list('recipe_id', 'day', 'views', 'visitors_sketch').order_by('recipe_id', 'day')
+
+        periods = {}
+        for recipe_id, day, views, sketch in rows.iterator():
+            key = (recipe_id, period_start(day, period))
+            total = periods.setdefault(key, [0, HyperLogLog()])
+            total[0] += views
+            if sketch:
+                total[1].merge(HyperLogLog.from_bytes(sketch))
+
+        for (recipe_id, start), (views, sketch) in periods.items():
+            RecipeVisitorRollup.objects.update_or_create(
+                recipe_id=recipe_id, period=period, period_start=start,
+                defaults={
+                    'views': views,
+                    'visitors_sketch': sketch.to_bytes(),
+                    'unique_visitors': sketch.count(),
+                }
+            )
+            written += 1
+    return written
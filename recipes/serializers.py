@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from backend.perf import TimedSerializerMixin
 from django.contrib.auth.models import User
 from .models import Recipe, Rating, RecipeImage
 from users.models import UserProfile
@@ -6,14 +7,14 @@ from users.serializers import UserSerializer, UserProfileSerializer
 
 
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = Rating
         fields = ('id', 'user', 'score', 'created_at')
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     
     class Meta:
@@ -26,7 +27,17 @@ class RecipeImageSerializer(serializers.ModelSerializer):
             return str(obj.image.url)
         return None
 
-class RecipeSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Aceita fields=[...] no construtor para devolver apenas parte dos campos"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     average_rating = serializers.FloatField(read_only=True, required=False, default=0)
     images = RecipeImageSerializer(many=True, read_only=True, required=False)
@@ -55,11 +66,10 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_image_url(self, obj):
         try:
-            # Verificar se a receita tem imagens associadas
-            primary_image = obj.images.filter(is_primary=True).first()
-            if not primary_image:
-                primary_image = obj.images.first()
-                
+            # As imagens já vêm ordenadas com a primária primeiro; usar all()
+            # aproveita o prefetch_related('images') quando existir
+            primary_image = next(iter(obj.images.all()), None)
+
             if primary_image and primary_image.image:
                 # Cloudinary já fornece URLs completas, não precisamos de build_absolute_uri
                 return str(primary_image.image.url)
@@ -67,4 +77,30 @@ class RecipeSerializer(serializers.ModelSerializer):
             import logging
             logger = logging.getLogger('django')
             logger.error(f"Erro ao obter URL da imagem: {str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+class RecipeSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Representação compacta de uma receita para listas e cards.
+
+    Espera um queryset com select_related('author') e prefetch_related('images')
+    para não disparar consultas por receita.
+    """
+    author = serializers.CharField(source='author.username', read_only=True)
+    average_rating = serializers.FloatField(read_only=True, default=0)
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = [
+            'id', 'title', 'slug', 'recipe_class', 'genre', 'style',
+            'image_url', 'author', 'average_rating', 'views_count'
+        ]
+
+    def get_image_url(self, obj):
+        # As imagens pré-carregadas já vêm ordenadas com a primária primeiro
+        for image in obj.images.all():
+            if image.image:
+                return str(image.image.url)
+            break
+        return None
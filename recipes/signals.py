@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .authors import recipe_created, recipe_deleted
+from .leaderboards import invalidate_leaderboards
+from .models import Rating, Recipe
+from .profiles import invalidate_author_profile
+from .ratings import rating_deleted, rating_saved
+from .slugs import invalidate_slugs
+from users.models import UserProfile
+
+
+def _author_being_deleted(origin, author_id):
+    # Numa exclusão de usuários o AuthorStats do autor também sai: não há o que ajustar
+    if isinstance(origin, User):
+        return origin.pk == author_id
+    if getattr(origin, 'model', None) is User:
+        return origin.filter(pk=author_id).exists()
+    return False
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_leaderboards(sender, instance, **kwargs):
+    # Edições podem mudar recipe_class/style; exclusões deixam ids órfãos no ranking
+    invalidate_leaderboards(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_saved_recipe_slugs(sender, instance, **kwargs):
+    # O slug novo pode estar guardado como inexistente e o antigo ainda aponta para si mesmo
+    invalidate_slugs(instance.slug, getattr(instance, '_previous_slug', None))
+
+
+@receiver(pre_delete, sender=Recipe)
+def collect_recipe_slug_history(sender, instance, **kwargs):
+    instance._history_slugs = list(instance.slug_history.values_list('slug', flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_deleted_recipe_slugs(sender, instance, **kwargs):
+    invalidate_slugs(instance.slug, *getattr(instance, '_history_slugs', []))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_author_profile(sender, instance, **kwargs):
+    invalidate_author_profile(instance.author_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_author_page(sender, instance, **kwargs):
+    invalidate_author_profile(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        recipe_created(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, origin=None, **kwargs):
+    if not _author_being_deleted(origin, instance.author_id):
+        recipe_deleted(instance)
+
+
+@receiver(post_delete, sender=Rating)
+def uncount_deleted_rating(sender, instance, origin=None, **kwargs):
+    # Na exclusão da receita as avaliações saem em cascata e recipe_deleted já as desconta
+    if isinstance(origin, Recipe) or getattr(origin, 'model', None) is Recipe:
+        return
+    if isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        author_id = Recipe.objects.filter(pk=instance.recipe_id).values_list('author_id', flat=True).first()
+        if author_id is None or _author_being_deleted(origin, author_id):
+            return  # a receita sai junto com o autor
+    rating_deleted(instance)
+
+
+@receiver(post_save, sender=Rating)
+def count_saved_rating(sender, instance, created, raw=False, **kwargs):
+    # save_rating grava sem signals; aqui chegam admin, Rating.objects.create e afins
+    if not raw:
+        rating_saved(instance, created)
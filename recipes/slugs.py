@@ -0,0 +1,131 @@
+"""
+Resolução de slug -> receita com cache em dois níveis.
+
+Cada slug é mapeado para (id da receita, slug atual, versão), onde a versão é
+o updated_at da receita em milissegundos. Slugs antigos (RecipeSlugHistory)
+resolvem para o slug atual, e as views respondem com um 301 sem carregar a
+receita.
+
+- Nível 1: LRU no processo, com TTL curto, já que a invalidação feita por um
+  worker não alcança a memória dos outros.
+- Nível 2: cache do Django, invalidado pelos sinais de salvamento e exclusão
+  de Recipe (recipes.signals). Só é compartilhado entre workers com um
+  backend compartilhado; veja a nota sobre CACHES em backend/settings.py,
+  que também explica o SLUG_CACHE_TTL curto.
+
+Slugs inexistentes também são guardados por pouco tempo, para que
+varreduras de URLs inválidas não consultem o banco a cada requisição.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Recipe, RecipeSlugHistory
+
+SlugEntry = namedtuple('SlugEntry', ['id', 'slug', 'version'])
+
+DEFAULT_LOCAL_SIZE = 1024
+DEFAULT_LOCAL_TTL = 30
+DEFAULT_SHARED_TTL = 30
+MISSING_TTL = 30
+
+_MISSING = 'missing'
+
+
+def _key(slug):
+    return f'recipe-slug:{slug}'
+
+
+class LocalLRU:
+    """Dicionário LRU com expiração por item, seguro entre threads"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+local_cache = LocalLRU(
+    getattr(settings, 'SLUG_CACHE_LOCAL_SIZE', DEFAULT_LOCAL_SIZE),
+    getattr(settings, 'SLUG_CACHE_LOCAL_TTL', DEFAULT_LOCAL_TTL),
+)
+
+
+def _version(updated_at):
+    return int(updated_at.timestamp() * 1000)
+
+
+def _first(queryset):
+    # Slugs são únicos: [:1] evita o ORDER BY que first() acrescenta
+    return next(iter(queryset[:1]), None)
+
+
+def _load(slug):
+    row = _first(Recipe.objects.filter(slug=slug).values_list('pk', 'slug', 'updated_at'))
+    if row is None:
+        row = _first(
+            RecipeSlugHistory.objects.filter(slug=slug)
+            .values_list('recipe_id', 'recipe__slug', 'recipe__updated_at')
+        )
+    if row is None:
+        return None
+    recipe_id, current_slug, updated_at = row
+    return SlugEntry(recipe_id, current_slug, _version(updated_at))
+
+
+def resolve_slug(slug):
+    """Retorna o SlugEntry do slug (atual ou antigo) ou None se não existir"""
+    entry = local_cache.get(slug)
+    if entry is None:
+        entry = cache.get(_key(slug))
+        if entry is None:
+            entry = _load(slug)
+            if entry is None:
+                cache.set(_key(slug), _MISSING, MISSING_TTL)
+            else:
+                cache.set(
+                    _key(slug), tuple(entry),
+                    getattr(settings, 'SLUG_CACHE_TTL', DEFAULT_SHARED_TTL)
+                )
+        elif entry != _MISSING:
+            entry = SlugEntry(*entry)
+        local_cache.set(slug, entry or _MISSING)
+    return None if entry == _MISSING else entry
+
+
+def invalidate_slugs(*slugs):
+    slugs = [slug for slug in slugs if slug]
+    for slug in slugs:
+        local_cache.delete(slug)
+    cache.delete_many([_key(slug) for slug in slugs])
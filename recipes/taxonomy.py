@@ -0,0 +1,113 @@
+"""
+Taxonomia de receitas (classes, estilos e níveis nutricionais).
+
+Os rótulos vêm das listas de choices de recipes.models e as contagens de um
+GROUP BY por campo. O resultado é compilado já codificado em JSON e com um
+ETag forte, e só é recompilado depois de TAXONOMY_REFRESH_SECONDS.
+
+O comando build_taxonomy grava static/taxonomy.json no deploy e
+RecipesConfig.ready() carrega esse arquivo, então nenhum worker monta a
+taxonomia durante uma requisição antes da primeira recompilação.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import (
+    Recipe, RECIPE_CLASS_CHOICES, STYLE_CHOICES, NUTRITIONAL_LEVEL_CHOICES
+)
+
+TAXONOMY_FIELDS = (
+    ('recipe_class', RECIPE_CLASS_CHOICES),
+    ('style', STYLE_CHOICES),
+    ('nutritional_level', NUTRITIONAL_LEVEL_CHOICES),
+)
+
+logger = logging.getLogger('django')
+
+DEFAULT_REFRESH_SECONDS = 3600
+
+
+class CompiledTaxonomy:
+    def __init__(self, data):
+        self.data = data
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = '"%s"' % hashlib.sha256(self.body).hexdigest()[:32]
+        self.built_at = time.monotonic()
+
+
+def _count_values(field):
+    rows = Recipe.objects.order_by().values(field).annotate(total=Count('id'))
+    return {row[field]: row['total'] for row in rows}
+
+
+def build_taxonomy(with_counts=True):
+    """Monta o dicionário da taxonomia a partir das choices do modelo"""
+    data = {}
+    for field, choices in TAXONOMY_FIELDS:
+        counts = _count_values(field) if with_counts else {}
+        data[field] = [
+            {'value': value, 'label': label, 'count': counts.get(value, 0)}
+            for value, label in choices
+        ]
+
+    # Sem contagens (build sem banco) os valores acima são todos 0
+    data['counts'] = with_counts
+
+    # Chaves antigas mantidas para compatibilidade com o frontend
+    data['classes'] = data['style']
+    data['genres'] = data['recipe_class']
+    return data
+
+
+def prebuilt_taxonomy_path():
+    return os.path.join(settings.STATICFILES_DIRS[0], 'taxonomy.json')
+
+
+_lock = threading.Lock()
+_compiled = None
+
+
+def load_prebuilt_taxonomy(path=None):
+    """Usa o arquivo gerado por build_taxonomy como taxonomia compilada; retorna se carregou"""
+    global _compiled
+    path = path or prebuilt_taxonomy_path()
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        logger.warning(f"Taxonomia pré-compilada ignorada ({path}): {str(e)}")
+        return False
+    if not data.get('counts'):
+        # Gerada sem banco: servir contagens zeradas seria pior que compilar na primeira requisição
+        return False
+    with _lock:
+        _compiled = CompiledTaxonomy(data)
+    return True
+
+
+def get_compiled_taxonomy():
+    """Retorna a taxonomia compilada, recompilando se estiver expirada"""
+    global _compiled
+    refresh = getattr(settings, 'TAXONOMY_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+    compiled = _compiled
+    if compiled is None or time.monotonic() - compiled.built_at > refresh:
+        with _lock:
+            if _compiled is compiled:
+                _compiled = CompiledTaxonomy(build_taxonomy())
+            compiled = _compiled
+    return compiled
+
+
+def invalidate_taxonomy():
+    global _compiled
+    with _lock:
+        _compiled = None
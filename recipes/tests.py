@@ -1,33 +1,69 @@
-from django.test import TestCase, Client
+import io
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Recipe, Rating
+from django.utils import timezone
+
+from backend import metrics
+
+from . import home, leaderboards
+from .authors import reconcile_author_stats
+from .hll import HyperLogLog
+from .leaderboards import compute_bayesian_rating, get_leaderboard
+from .models import (
+    RECIPE_CLASS_CHOICES, AuthorStats, Rating, RatingHistory, RatingHistorySummary, Recipe,
+    RecipeDailyStats, RecipeManager, RecipeSlugHistory, RecipeVisitorRollup,
+)
+from .ratings import compact_rating_history, rebuild_rating_histograms, save_rating
+from .rollups import activity_buffer, record_activity, rollup_visitor_periods, visitor_id
+from .slugs import local_cache, resolve_slug
+from .taxonomy import invalidate_taxonomy, load_prebuilt_taxonomy
+from .trending import decay_factor, update_trending_scores
+
+
+def recipe_fields(**overrides):
+    """Campos de uma receita de teste; só os informados diferem do padrão"""
+    fields = {
+        'title': 'Test Recipe',
+        'recipe_class': 'ENTRADA',
+        'style': 'CASEIRA',
+        'ingredients': 'Test ingredients',
+        'instructions': 'Test instructions',
+        **overrides,
+    }
+    fields.setdefault('genre', fields['recipe_class'])
+    return fields
+
+
+def make_recipe(author, **overrides):
+    return Recipe.objects.create(author=author, **recipe_fields(**overrides))
+
 
 class RecipeTests(TestCase):
     def setUp(self):
         self.client = Client()
         self.user = User.objects.create_user(username='testuser', password='12345')
-        self.recipe = Recipe.objects.create(
-            title='Test Recipe',
-            recipe_class='ENTRADA',
-            style='GOURMET',
-            genre='ENTRADA',
-            ingredients='Test ingredients',
-            instructions='Test instructions',
-            author=self.user
-        )
+        self.recipe = make_recipe(self.user, style='GOURMET')
 
     def test_recipe_creation(self):
         self.assertEqual(self.recipe.title, 'Test Recipe')
         self.assertEqual(self.recipe.author, self.user)
 
     def test_recipe_rating(self):
-        rating = Rating.objects.create(
-            recipe=self.recipe,
-            user=self.user,
-            score=8
-        )
-        self.assertEqual(self.recipe.average_rating, 8)
+        result = save_rating(self.recipe, self.user, 8)
+        self.assertEqual(result.average_rating, 8)
+        self.assertEqual(self.recipe.average_rating(), 8)
 
     def test_recipe_search(self):
         response = self.client.get(reverse('search_recipes'), {'q': 'salada'})
@@ -52,3 +88,1168 @@ class RecipeTests(TestCase):
         }
         response = self.client.post(reverse('recipe-list'), data)
         self.assertEqual(response.status_code, 400)
+
+
+class SharedCacheProxy:
+    """Proxy reverso mínimo que respeita Cache-Control, Vary e Set-Cookie."""
+
+    def __init__(self, client):
+        self.client = client
+        self.store = {}
+        self.upstream_requests = 0
+
+    def _key(self, path, vary, headers):
+        return (path,) + tuple(headers.get(h.strip().lower(), '') for h in vary.split(',') if h.strip())
+
+    def get(self, path, **headers):
+        for (cached_path, vary), variants in self.store.items():
+            key = self._key(path, vary, headers)
+            if cached_path == path and key in variants:
+                return variants[key]
+
+        self.upstream_requests += 1
+        response = self.client.get(path, **{f'HTTP_{k.upper().replace("-", "_")}': v for k, v in headers.items()})
+        cache_control = response.get('Cache-Control', '')
+        if 'public' in cache_control and 'max-age=0' not in cache_control and not response.cookies:
+            vary = response.get('Vary', '')
+            self.store.setdefault((path, vary), {})[self._key(path, vary, headers)] = response
+        return response
+
+
+class CachePolicyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cacheuser', password='12345')
+        self.recipe = make_recipe(self.user, title='Cached Recipe', style='GOURMET')
+
+    def test_anonymous_response_is_public_without_cookies(self):
+        self.client.cookies['csrftoken'] = 'x' * 64
+        response = self.client.get(reverse('featured_recipes'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('stale-while-revalidate=', response['Cache-Control'])
+        self.assertNotIn('cookie', response.get('Vary', '').lower())
+        self.assertIn('authorization', response.get('Vary', '').lower())
+        self.assertFalse(response.cookies)
+
+    def test_authenticated_response_is_private(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('featured_recipes'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+    def test_error_responses_are_not_cached(self):
+        response = self.client.get(reverse('get_user_by_username', args=['nao-existe']))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Cache-Control'], 'no-store')
+
+    def test_recipe_detail_always_reaches_django(self):
+        # Cada leitura conta uma visualização, então o detalhe não pode vir do cache
+        proxy = SharedCacheProxy(self.client)
+        path = reverse('recipe_by_slug', args=[self.recipe.slug])
+        for _ in range(3):
+            response = proxy.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-store', response['Cache-Control'])
+        self.assertEqual(proxy.upstream_requests, 3)
+
+    def test_repeat_requests_are_served_by_reverse_proxy(self):
+        proxy = SharedCacheProxy(self.client)
+        paths = [
+            reverse('featured_recipes'),
+            reverse('search_recipes') + '?recipe_class=ENTRADA',
+            reverse('get_categories'),
+            reverse('get_user_by_username', args=[self.user.username]),
+        ]
+        for path in paths:
+            for _ in range(3):
+                self.assertEqual(proxy.get(path, cookie='csrftoken=abc').status_code, 200)
+        self.assertEqual(proxy.upstream_requests, len(paths))
+
+
+class TaxonomyTests(TestCase):
+    def setUp(self):
+        invalidate_taxonomy()
+        self.user = User.objects.create_user(username='taxonomyuser', password='12345')
+        for title in ('Salada', 'Sopa'):
+            make_recipe(self.user, title=title)
+
+    def tearDown(self):
+        invalidate_taxonomy()
+
+    def test_taxonomy_matches_model_choices_with_counts(self):
+        response = self.client.get(reverse('get_categories'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [item['value'] for item in data['recipe_class']],
+            [value for value, _ in RECIPE_CLASS_CHOICES]
+        )
+        counts = {item['value']: item['count'] for item in data['recipe_class']}
+        self.assertEqual(counts['ENTRADA'], 2)
+        self.assertEqual(counts['SOBREMESA'], 0)
+
+    def test_taxonomy_is_compiled_once_and_supports_etag(self):
+        response = self.client.get(reverse('get_categories'))
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse('get_categories'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+
+
+    def test_prebuilt_file_is_served_without_queries(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(STATICFILES_DIRS=[directory]):
+            call_command('build_taxonomy', stdout=io.StringIO())
+            invalidate_taxonomy()
+            self.assertTrue(load_prebuilt_taxonomy())
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('get_categories'))
+        counts = {item['value']: item['count'] for item in response.json()['recipe_class']}
+        self.assertEqual(counts['ENTRADA'], 2)
+        self.assertFalse(load_prebuilt_taxonomy('/nao/existe/taxonomy.json'))
+
+    def test_prebuilt_file_without_counts_is_ignored(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(STATICFILES_DIRS=[directory]):
+            call_command('build_taxonomy', '--no-counts', stdout=io.StringIO())
+            invalidate_taxonomy()
+            self.assertFalse(load_prebuilt_taxonomy())
+        counts = {item['value']: item['count'] for item in self.client.get(reverse('get_categories')).json()['recipe_class']}
+        self.assertEqual(counts['ENTRADA'], 2)
+
+
+@override_settings(HOME_BUNDLE_MAX_WORKERS=1)
+class HomeBundleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='homeuser', password='12345')
+        for index in range(3):
+            make_recipe(self.user, title=f'Home Recipe {index}', recipe_class='SOBREMESA', views_count=index)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_bundle_returns_all_sections(self):
+        response = self.client.get(reverse('home_bundle'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data), {'featured', 'trending', 'new', 'categories'})
+        self.assertEqual(data['featured'][0]['title'], 'Home Recipe 2')
+        self.assertEqual(data['new'][0]['title'], 'Home Recipe 2')
+        self.assertEqual(data['featured'][0]['author'], 'homeuser')
+        self.assertIn('recipe_class', data['categories'])
+
+    def test_sections_are_cached(self):
+        self.client.get(reverse('home_bundle'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home_bundle'))
+        self.assertEqual(len(response.json()['new']), 3)
+
+
+class HomeBundlePoolTests(TransactionTestCase):
+    def probe(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return threading.get_ident(), connection.connection
+
+    @override_settings(HOME_BUNDLE_MAX_WORKERS=2)
+    def test_pool_threads_reuse_their_connections(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        sections = {name: self.probe for name in home.SECTIONS}
+        with mock.patch.object(home, '_executor', executor), \
+                mock.patch.dict(home.SECTIONS, sections), \
+                mock.patch.dict(connections.settings['default'], {'CONN_MAX_AGE': 60}), \
+                mock.patch.object(type(connections['default']), 'close', autospec=True) as close:
+            first = dict(home._build_sections(list(sections)).values())
+            second = dict(home._build_sections(list(sections)).values())
+
+        close.assert_not_called()
+        self.assertLessEqual(len(first), 2)
+        for thread_id, raw_connection in second.items():
+            if thread_id in first:
+                self.assertIs(raw_connection, first[thread_id])
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trendinguser', password='12345')
+        self.old = self._create('Receita Antiga', 'SOBREMESA')
+        self.new = self._create('Receita Nova', 'SOBREMESA')
+        self.other = self._create('Outra Receita', 'ENTRADA')
+        self.today = timezone.localdate()
+
+    def _create(self, title, recipe_class):
+        return make_recipe(self.user, title=title, recipe_class=recipe_class)
+
+    def test_recent_activity_outranks_old_activity(self):
+        record_activity(self.old.id, views=100, day=self.today - timedelta(days=20))
+        record_activity(self.new.id, views=30, day=self.today)
+        record_activity(self.new.id, ratings_count=1, ratings_sum=10, day=self.today)
+
+        recalculated, _ = update_trending_scores(self.today)
+        self.assertEqual(recalculated, 2)
+
+        self.old.refresh_from_db()
+        self.new.refresh_from_db()
+        self.assertAlmostEqual(self.new.trending_score, 35)
+        self.assertLess(self.old.trending_score, self.new.trending_score)
+
+    def test_inactive_recipes_are_only_decayed(self):
+        record_activity(self.old.id, views=10, day=self.today)
+        update_trending_scores(self.today)
+
+        # O balde de hoje ainda pode crescer, então é reavaliado uma última vez amanhã
+        self.assertEqual(update_trending_scores(self.today + timedelta(days=1)), (1, 0))
+
+        later = self.today + timedelta(days=2)
+        with self.assertNumQueries(4):
+            recalculated, decayed = update_trending_scores(later)
+        self.assertEqual((recalculated, decayed), (0, 1))
+
+        self.old.refresh_from_db()
+        self.assertAlmostEqual(self.old.trending_score, 10 * decay_factor(2))
+        self.assertEqual(self.old.trending_day, later)
+
+    def test_featured_uses_denormalized_ordering(self):
+        record_activity(self.old.id, views=5, day=self.today)
+        update_trending_scores(self.today)
+        save_rating(self.other, self.user, 9)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('featured_recipes'))
+        self.assertEqual(
+            [item['slug'] for item in response.json()],
+            [self.old.slug, self.other.slug, self.new.slug],
+        )
+        self.assertEqual(response.json()[1]['average_rating'], 9)
+
+    def test_trending_endpoint_filters_by_recipe_class(self):
+        for recipe in (self.new, self.other):
+            record_activity(recipe.id, views=5, day=self.today)
+        update_trending_scores(self.today)
+
+        response = self.client.get(reverse('trending_recipes'), {'recipe_class': 'ENTRADA'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['slug'] for item in response.json()], [self.other.slug])
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='rollupauthor', password='12345')
+        self.other = User.objects.create_user(username='rollupother', password='12345')
+        self.recipe = make_recipe(self.author, title='Rollup Recipe', recipe_class='LANCHE')
+        self.today = timezone.localdate()
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    @override_settings(ROLLUP_FLUSH_INTERVAL=3600)
+    def test_views_are_written_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                self.client.get(reverse('recipe_by_slug', args=[self.recipe.slug]))
+        writes = [q['sql'] for q in queries if q['sql'].startswith(('UPDATE', 'INSERT'))]
+        self.assertEqual(writes, [])
+
+        self.assertEqual(activity_buffer.flush(), 1)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.views_count, 5)
+        self.assertEqual(RecipeDailyStats.objects.get(recipe=self.recipe, day=self.today).views, 5)
+
+    @override_settings(ROLLUP_FLUSH_MAX_PENDING=1)
+    def test_full_buffer_wakes_flusher_instead_of_flushing_in_request(self):
+        with mock.patch.object(activity_buffer, '_wake', threading.Event()) as wake:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('recipe_by_slug', args=[self.recipe.slug]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(wake.is_set())
+        writes = [q['sql'] for q in queries if q['sql'].startswith(('UPDATE', 'INSERT'))]
+        self.assertEqual(writes, [])
+
+    def test_failed_flush_returns_events_to_buffer(self):
+        activity_buffer.add(self.recipe.id, views=2, visitor='a')
+        with mock.patch('recipes.rollups.record_activity', side_effect=RuntimeError('banco fora')):
+            with self.assertRaises(RuntimeError):
+                activity_buffer.flush()
+
+        activity_buffer.add(self.recipe.id, views=1, visitor='b')
+        self.assertEqual(activity_buffer.flush(), 1)
+        stats = RecipeDailyStats.objects.get(recipe=self.recipe, day=self.today)
+        self.assertEqual((stats.views, stats.unique_visitors), (3, 2))
+
+    def test_author_analytics_reads_rollups_for_range(self):
+        record_activity(self.recipe.id, views=3, day=self.today - timedelta(days=1))
+        record_activity(self.recipe.id, views=2, ratings_count=2, ratings_sum=15, day=self.today)
+        record_activity(self.recipe.id, views=50, day=self.today - timedelta(days=30))
+
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('author_analytics'), {
+            'start': (self.today - timedelta(days=1)).isoformat(),
+            'end': self.today.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([day['views'] for day in data['days']], [3, 2])
+        self.assertEqual(data['totals']['views'], 5)
+        self.assertEqual(data['totals']['average_rating'], 7.5)
+
+        self.client.force_login(self.other)
+        response = self.client.get(reverse('author_analytics'))
+        self.assertEqual(response.json()['days'], [])
+
+    def test_author_analytics_rejects_invalid_dates(self):
+        self.client.force_login(self.author)
+        for params in ({'end': '2024-02-30'}, {'start': '2024-13-01'}, {'start': '2024-02-02', 'end': '2024-02-01'}):
+            response = self.client.get(reverse('author_analytics'), params)
+            self.assertEqual(response.status_code, 400)
+
+
+class UniqueVisitorTests(TestCase):
+    def setUp(self):
+        activity_buffer.drain()
+        self.user = User.objects.create_user(username='visitoruser', password='12345')
+        self.recipe = make_recipe(self.user, title='Visitor Recipe', recipe_class='SUCO')
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def test_hyperloglog_estimate_and_merge(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for index in range(3000):
+            first.add(f'visitor-{index}')
+            first.add(f'visitor-{index}')
+            second.add(f'visitor-{index + 1500}')
+
+        self.assertAlmostEqual(first.count(), 3000, delta=300)
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+        self.assertAlmostEqual(merged.count(), 4500, delta=450)
+        self.assertLess(len(HyperLogLog().to_bytes()), 64)
+
+    @override_settings(ROLLUP_FLUSH_INTERVAL=3600)
+    def test_repeat_views_count_once(self):
+        url = reverse('recipe_by_slug', args=[self.recipe.slug])
+        for _ in range(3):
+            self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.client.get(url, REMOTE_ADDR='10.0.0.2')
+        activity_buffer.flush()
+        self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        activity_buffer.flush()
+
+        stats = RecipeDailyStats.objects.get(recipe=self.recipe)
+        self.assertEqual(stats.views, 5)
+        self.assertEqual(stats.unique_visitors, 2)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_visitors_behind_the_proxy_are_told_apart(self):
+        def request(forwarded):
+            return RequestFactory().get('/', REMOTE_ADDR='10.0.0.254', HTTP_USER_AGENT='Mozilla/5.0',
+                                        HTTP_X_FORWARDED_FOR=forwarded)
+
+        first = visitor_id(request('203.0.113.1'))
+        self.assertNotEqual(first, visitor_id(request('203.0.113.2')))
+        # Entradas forjadas pelo cliente à esquerda do proxy são ignoradas
+        self.assertEqual(first, visitor_id(request('198.51.100.7, 203.0.113.1')))
+
+    def test_daily_sketches_are_merged_into_weekly_and_monthly_totals(self):
+        monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+        for offset, visitors in ((0, ['a', 'b']), (1, ['b', 'c'])):
+            sketch = HyperLogLog()
+            for visitor in visitors:
+                sketch.add(visitor)
+            record_activity(self.recipe.id, views=len(visitors), day=monday + timedelta(days=offset), sketch=sketch)
+
+        rollup_visitor_periods(since=monday, today=monday + timedelta(days=1))
+
+        week = RecipeVisitorRollup.objects.get(recipe=self.recipe, period='WEEK', period_start=monday)
+        self.assertEqual((week.views, week.unique_visitors), (4, 3))
+        self.assertTrue(RecipeVisitorRollup.objects.filter(recipe=self.recipe, period='MONTH').exists())
+
+
+class RatingHistogramTests(TestCase):
+    def setUp(self):
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='histogramauthor', password='12345')
+        self.rater = User.objects.create_user(username='histogramrater', password='12345')
+        self.recipe = make_recipe(self.author, title='Histogram Recipe', recipe_class='DRINK')
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def test_rerating_moves_the_histogram_counter(self):
+        self.client.force_login(self.rater)
+        url = reverse('recipe-rate', args=[self.recipe.slug])
+        self.client.post(url, {'score': 4}, content_type='application/json')
+        self.client.post(url, {'score': 9}, content_type='application/json')
+
+        self.recipe.refresh_from_db()
+        distribution = self.recipe.rating_distribution()
+        self.assertEqual(distribution[3], 0)
+        self.assertEqual(distribution[8], 1)
+        self.assertEqual(self.recipe.total_ratings(), 1)
+
+    def test_ratings_endpoint_reads_histogram_without_aggregates(self):
+        self.client.force_login(self.rater)
+        self.client.post(reverse('recipe-rate', args=[self.recipe.slug]), {'score': 8}, content_type='application/json')
+        self.client.logout()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get_recipe_ratings', args=[self.recipe.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'AVG(' in q['sql'] or 'COUNT(' in q['sql']])
+        data = response.json()
+        self.assertEqual(data['rating_distribution'], [0, 0, 0, 0, 0, 0, 0, 1, 0, 0])
+        self.assertEqual(data['average_rating'], 8)
+        self.assertEqual(data['total_ratings'], 1)
+
+
+class BatchRatingsTests(TestCase):
+    def setUp(self):
+        activity_buffer.drain()
+        self.user = User.objects.create_user(username='batchuser', password='12345')
+        self.recipes = [
+            make_recipe(self.user, title=f'Batch Recipe {index}', recipe_class='LANCHE')
+            for index in range(3)
+        ]
+        save_rating(self.recipes[0], self.user, 6)
+        save_rating(self.recipes[2], self.user, 10)
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def test_batch_lookup_uses_two_queries(self):
+        self.client.force_login(self.user)
+        ids = f'{self.recipes[2].id},{self.recipes[1].id},999999'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('batch_recipe_ratings'), {
+                'ids': ids, 'slugs': self.recipes[0].slug
+            })
+        self.assertEqual(response.status_code, 200)
+        recipe_queries = [q for q in queries if 'recipes_' in q['sql']]
+        self.assertEqual(len(recipe_queries), 2)
+
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         [self.recipes[2].id, self.recipes[1].id, self.recipes[0].id])
+        self.assertEqual(data['results'][0]['user_rating'], 10)
+        self.assertIsNone(data['results'][1]['user_rating'])
+        self.assertEqual(data['results'][2]['average_rating'], 6)
+        self.assertEqual(data['missing'], [999999])
+
+    def test_batch_lookup_requires_ids_or_slugs(self):
+        response = self.client.get(reverse('batch_recipe_ratings'))
+        self.assertEqual(response.status_code, 400)
+
+
+class RatingServiceTests(TestCase):
+    def setUp(self):
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='serviceauthor', password='12345')
+        self.recipe = make_recipe(self.author, title='Service Recipe')
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def test_upsert_appends_history_and_returns_fresh_aggregates(self):
+        rater = User.objects.create_user(username='servicerater', password='12345')
+        first = save_rating(self.recipe, self.author, 6)
+        second = save_rating(self.recipe, rater, 10)
+        again = save_rating(self.recipe, rater, 8)
+
+        self.assertTrue(first.created)
+        self.assertFalse(again.created)
+        self.assertEqual(again.previous_score, 10)
+        self.assertEqual(again.rating.pk, second.rating.pk)
+        self.assertEqual((again.average_rating, again.total_ratings), (7, 2))
+        self.assertEqual(Rating.objects.filter(recipe=self.recipe).count(), 2)
+        self.assertEqual(
+            list(RatingHistory.objects.filter(rating=second.rating.pk).order_by('id').values_list('score', flat=True)),
+            [10, 8]
+        )
+
+    def test_rate_endpoints_return_numbers(self):
+        self.client.force_login(self.author)
+        response = self.client.post(
+            reverse('rate_recipe', args=[self.recipe.id]), {'score': 9}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['average_rating'], 9)
+        self.assertEqual(response.json()['total_ratings'], 1)
+
+        response = self.client.post(
+            reverse('recipe-rate', args=[self.recipe.slug]), {'score': 5}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['average_rating'], 5)
+        self.assertEqual(response.json()['rating']['score'], 5)
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='slugauthor', password='12345')
+
+    def make_recipe(self, title='Bolo de Cenoura'):
+        # Ainda não salva: os testes medem as consultas do save()
+        return Recipe(author=self.author, **recipe_fields(title=title, recipe_class='SOBREMESA'))
+
+    def test_next_suffix_found_with_one_query(self):
+        for _ in range(5):
+            self.make_recipe().save()
+        self.make_recipe('Bolo de Cenoura com Chocolate').save()
+
+        recipe = self.make_recipe()
+        with CaptureQueriesContext(connection) as ctx:
+            recipe.save()
+        selects = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(recipe.slug, 'bolo-de-cenoura-5')
+
+    def test_suffix_match_ignores_longer_titles(self):
+        self.make_recipe().save()
+        self.make_recipe('Bolo de Cenoura com Chocolate').save()
+        self.assertEqual(
+            Recipe.objects.allocate_slugs(['bolo-de-cenoura', 'bolo-de-cenoura-com']),
+            ['bolo-de-cenoura-1', 'bolo-de-cenoura-com'],
+        )
+
+    def test_retries_when_slug_taken_concurrently(self):
+        self.make_recipe().save()
+        recipe = self.make_recipe()
+        # Simula outra requisição que ocupou o slug depois da consulta
+        with mock.patch.object(
+            RecipeManager, 'allocate_slugs', side_effect=[['bolo-de-cenoura'], ['bolo-de-cenoura-1']]
+        ):
+            recipe.save()
+        self.assertEqual(recipe.slug, 'bolo-de-cenoura-1')
+
+    def test_bulk_create_allocates_all_slugs(self):
+        self.make_recipe().save()
+        with CaptureQueriesContext(connection) as ctx:
+            created = Recipe.objects.bulk_create(
+                [self.make_recipe(), self.make_recipe(), self.make_recipe('Pudim')]
+            )
+        selects = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual([r.slug for r in created], ['bolo-de-cenoura-1', 'bolo-de-cenoura-2', 'pudim'])
+
+
+class SlugHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='renameauthor', password='12345')
+        self.recipe = make_recipe(self.author, title='Torta de Palmito', recipe_class='PRATO_PRINCIPAL')
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def test_resolution_is_cached(self):
+        with self.assertNumQueries(1):
+            entry = resolve_slug('torta-de-palmito')
+        self.assertEqual((entry.id, entry.slug), (self.recipe.pk, 'torta-de-palmito'))
+        self.assertIsNone(resolve_slug('nao-existe'))
+        with self.assertNumQueries(0):
+            resolve_slug('torta-de-palmito')
+            self.assertIsNone(resolve_slug('nao-existe'))
+
+        # Sem o LRU do processo, a resolução vem do cache do Django
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_slug('torta-de-palmito').id, self.recipe.pk)
+            self.assertIsNone(resolve_slug('nao-existe'))
+
+    def test_renamed_recipe_redirects_old_slug(self):
+        resolve_slug('torta-de-palmito')
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.title = 'Torta de Palmito com Azeitonas'
+        recipe.save()
+        self.assertEqual(recipe.slug, 'torta-de-palmito-com-azeitonas')
+        self.assertTrue(RecipeSlugHistory.objects.filter(slug='torta-de-palmito', recipe=recipe).exists())
+
+        response = self.client.get(reverse('recipe_by_slug', args=['torta-de-palmito']))
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], reverse('recipe_by_slug', args=[recipe.slug]))
+        self.assertEqual(self.client.get(response['Location']).status_code, 200)
+
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('recipe-detail', args=['torta-de-palmito']))
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], reverse('recipe-detail', args=[recipe.slug]))
+
+    def test_renaming_back_restores_original_slug(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.title = 'Torta de Palmito com Azeitonas'
+        recipe.save()
+        recipe.title = 'Torta de Palmito'
+        recipe.save()
+
+        self.assertEqual(recipe.slug, 'torta-de-palmito')
+        self.assertEqual(
+            list(RecipeSlugHistory.objects.filter(recipe=recipe).values_list('slug', flat=True)),
+            ['torta-de-palmito-com-azeitonas'],
+        )
+        self.assertEqual(resolve_slug('torta-de-palmito').slug, 'torta-de-palmito')
+
+    def test_old_slug_is_not_reused(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.title = 'Torta Salgada'
+        recipe.save()
+        other = make_recipe(self.author, title='Torta de Palmito', recipe_class='PRATO_PRINCIPAL')
+        self.assertEqual(other.slug, 'torta-de-palmito-1')
+
+    def test_deleted_recipe_is_not_served_from_cache(self):
+        self.assertEqual(self.client.get(reverse('recipe_by_slug', args=['torta-de-palmito'])).status_code, 200)
+        Recipe.objects.get(pk=self.recipe.pk).delete()
+        self.assertEqual(self.client.get(reverse('recipe_by_slug', args=['torta-de-palmito'])).status_code, 404)
+
+
+class BatchRecipesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='batchauthor', password='12345')
+        self.recipes = [
+            make_recipe(self.author, title=f'Batch Recipe {index}')
+            for index in range(3)
+        ]
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def test_keeps_order_reports_missing_and_skips_views(self):
+        first, second, third = self.recipes
+        params = {'ids': f'{third.id},999999', 'slugs': f'{first.slug},nao-existe,{second.slug}'}
+        # Receitas (com autor e perfil), imagens e o histórico para o slug não encontrado
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('batch_recipes'), params)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['results']], [third.id, first.id, second.id])
+        self.assertEqual(data['missing'], [999999, 'nao-existe'])
+        self.assertEqual(data['results'][0]['author']['username'], 'batchauthor')
+        self.assertEqual(activity_buffer.drain(), {})
+        self.assertEqual(Recipe.objects.get(pk=first.pk).views_count, 0)
+
+    def test_sparse_fieldsets(self):
+        first = self.recipes[0]
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('batch_recipes'), {'ids': first.id, 'fields': 'id,slug,title'})
+        self.assertEqual(response.json()['results'], [{'id': first.id, 'slug': first.slug, 'title': first.title}])
+
+        response = self.client.get(reverse('batch_recipes'), {'ids': first.id, 'fields': 'id,senha'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_renamed_slug_is_resolved(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        old_slug = recipe.slug
+        recipe.title = 'Entrada Renomeada'
+        recipe.save()
+
+        response = self.client.get(reverse('batch_recipes'), {'slugs': old_slug, 'fields': 'id,slug'})
+        self.assertEqual(response.json(), {'results': [{'id': recipe.id, 'slug': recipe.slug}], 'missing': []})
+
+
+class RecipeViewSetQueryPlanTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='planauthor', password='12345')
+        self.recipes = [
+            make_recipe(self.author, title=f'Plan Recipe {index}')
+            for index in range(3)
+        ]
+        self.client.force_login(self.author)
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def capture(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, content_type='application/json')
+        self.assertLess(response.status_code, 300, response.content)
+        recipe_selects = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "recipes_recipe"' in q['sql']
+        ]
+        for sql in ctx.captured_queries:
+            self.assertNotIn('GROUP BY', sql['sql'])
+            self.assertNotIn('AVG(', sql['sql'].upper())
+        return response, recipe_selects
+
+    def test_list_is_ordered_and_paginated(self):
+        response, selects = self.capture('get', reverse('recipe-list') + '?limit=2')
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertTrue(any('ORDER BY' in sql and 'LIMIT 2' in sql for sql in selects))
+
+    def test_list_without_page_keeps_plain_list_by_rating(self):
+        low, high, unrated = self.recipes
+        save_rating(low, self.author, 2)
+        save_rating(high, self.author, 10)
+        response, _ = self.capture('get', reverse('recipe-list'))
+        self.assertEqual([item['id'] for item in response.json()], [high.pk, low.pk, unrated.pk])
+
+    def test_retrieve_loads_one_row_with_relations(self):
+        slug = self.recipes[0].slug
+        response, selects = self.capture('get', reverse('recipe-detail', args=[slug]))
+        self.assertEqual(response.json()['average_rating'], 0)
+        self.assertEqual(len(selects), 2)  # resolução do slug e a receita com autor e perfil
+        self.assertIn('JOIN "auth_user"', selects[-1])
+        self.assertNotIn('ORDER BY', selects[-1])
+
+    def test_write_actions_use_plain_lookup(self):
+        recipe = self.recipes[0]
+        _, selects = self.capture('patch', reverse('recipe-detail', args=[recipe.slug]), {'genre': 'ENTRADA'})
+        self.assertNotIn('JOIN', selects[-1])
+        _, selects = self.capture('post', reverse('recipe-rate', args=[recipe.slug]), {'score': 7})
+        self.assertNotIn('ORDER BY', selects[0])
+        _, selects = self.capture('delete', reverse('recipe-detail', args=[self.recipes[1].slug]))
+        self.assertNotIn('JOIN', selects[-1])
+
+    def test_similar_uses_existing_fields(self):
+        response, _ = self.capture('get', reverse('recipe-similar', args=[self.recipes[0].slug]))
+        self.assertEqual(len(response.json()), 2)
+
+
+class RatingHistoryCompactionTests(TestCase):
+    def setUp(self):
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='historyauthor', password='12345')
+        self.recipe = make_recipe(self.author, title='History Recipe')
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def test_old_history_becomes_daily_summaries(self):
+        rating = save_rating(self.recipe, self.author, 4).rating
+        for score in (9, 6):
+            save_rating(self.recipe, self.author, score)
+        now = timezone.now()
+        old = now - timedelta(days=120)
+        recent_id = RatingHistory.objects.filter(rating=rating).order_by('-pk').values_list('pk', flat=True)[0]
+        RatingHistory.objects.exclude(pk=recent_id).update(created_at=old)
+
+        compacted = compact_rating_history(now - timedelta(days=90), batch_size=1)
+
+        self.assertEqual(compacted, 2)
+        self.assertEqual(list(RatingHistory.objects.values_list('pk', flat=True)), [recent_id])
+        summary = RatingHistorySummary.objects.get(recipe=self.recipe)
+        self.assertEqual(summary.day, timezone.localdate(old))
+        self.assertEqual((summary.entries, summary.score_sum, summary.min_score, summary.max_score), (2, 13, 4, 9))
+
+        # Uma nova execução soma ao resumo existente
+        RatingHistory.objects.filter(pk=recent_id).update(created_at=old)
+        self.assertEqual(compact_rating_history(now - timedelta(days=90)), 1)
+        summary.refresh_from_db()
+        self.assertEqual((summary.entries, summary.score_sum, summary.max_score), (3, 19, 9))
+
+
+@override_settings(RATING_PRIOR_MEAN=7.0, RATING_PRIOR_WEIGHT=10)
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='boardauthor', password='12345')
+        self.raters = [User.objects.create_user(username=f'boardrater{index}', password='12345') for index in range(5)]
+        self.recipes = [
+            make_recipe(self.author, title=f'Board Recipe {index}', recipe_class='SOBREMESA')
+            for index in range(3)
+        ]
+
+    def tearDown(self):
+        activity_buffer.drain()
+        cache.clear()
+
+    def test_many_good_ratings_beat_a_single_perfect_one(self):
+        single, popular, _ = self.recipes
+        save_rating(single, self.raters[0], 10)
+        for rater in self.raters:
+            save_rating(popular, rater, 9)
+
+        single.refresh_from_db()
+        self.assertAlmostEqual(single.bayesian_rating, 80 / 11)
+        entries = get_leaderboard('recipe_class', 'SOBREMESA')
+        self.assertEqual([recipe_id for recipe_id, _ in entries], [popular.pk, single.pk])
+
+    def test_rating_discards_cached_board(self):
+        first, second, _ = self.recipes
+        save_rating(first, self.raters[0], 8)
+        get_leaderboard('style', 'CASEIRA')
+        with self.assertNumQueries(0):
+            get_leaderboard('style', 'CASEIRA')
+
+        save_rating(second, self.raters[0], 10)
+        with self.assertNumQueries(1):
+            entries = get_leaderboard('style', 'CASEIRA')
+        self.assertEqual([recipe_id for recipe_id, _ in entries], [second.pk, first.pk])
+
+    def test_leaving_full_board_forces_rebuild(self):
+        first, second, third = self.recipes
+        save_rating(first, self.raters[0], 9)
+        save_rating(second, self.raters[0], 8)
+        save_rating(third, self.raters[0], 7)
+
+        with mock.patch.object(leaderboards, 'LEADERBOARD_SIZE', 2):
+            cache.clear()
+            self.assertEqual([r for r, _ in get_leaderboard('recipe_class', 'SOBREMESA')], [first.pk, second.pk])
+            # second cai abaixo de third: o ranking é descartado e reconstruído
+            save_rating(second, self.raters[0], 1)
+            self.assertEqual([r for r, _ in get_leaderboard('recipe_class', 'SOBREMESA')], [first.pk, third.pk])
+
+    def test_top_rated_endpoint(self):
+        first, second, _ = self.recipes
+        save_rating(first, self.raters[0], 6)
+        save_rating(second, self.raters[0], 9)
+
+        response = self.client.get(reverse('top_rated_recipes'), {'recipe_class': 'SOBREMESA'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['slug'] for item in response.json()], [second.slug, first.slug])
+
+        self.assertEqual(self.client.get(reverse('top_rated_recipes')).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('top_rated_recipes'), {'style': 'INEXISTENTE'}).status_code, 400
+        )
+
+
+class AuthorProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='perfilautor', password='12345')
+        self.fan = User.objects.create_user(username='perfilfa', password='12345')
+        self.recipes = [
+            make_recipe(self.author, title=f'Perfil Recipe {index}', views_count=10)
+            for index in range(3)
+        ]
+        save_rating(self.recipes[0], self.fan, 8)
+        save_rating(self.recipes[1], self.fan, 6)
+
+    def url(self):
+        return reverse('author_profile', args=[self.author.username])
+
+    @override_settings(AUTHOR_PROFILE_PAGE_SIZE=2)
+    def test_profile_stats_and_first_page(self):
+        data = self.client.get(self.url()).json()
+        self.assertEqual(data['profile']['username'], 'perfilautor')
+        self.assertEqual(data['stats'], {
+            'recipes_count': 3, 'total_views': 30, 'ratings_count': 2, 'average_rating': 7.0,
+        })
+        self.assertEqual([item['id'] for item in data['recipes']['results']],
+                         [self.recipes[2].id, self.recipes[1].id])
+        self.assertEqual(data['recipes']['total_pages'], 2)
+
+        second = self.client.get(reverse('user_recipes', args=[self.author.id]), {'page': 2, 'limit': 2}).json()
+        self.assertEqual([item['id'] for item in second['results']], [self.recipes[0].id])
+
+    def test_cached_until_author_writes(self):
+        self.client.get(self.url())
+        with self.assertNumQueries(1):  # só a busca do usuário
+            self.client.get(self.url())
+
+        make_recipe(self.author, title='Perfil Recipe Nova')
+        self.assertEqual(self.client.get(self.url()).json()['stats']['recipes_count'], 4)
+
+        save_rating(self.recipes[2], self.fan, 10)
+        self.assertEqual(self.client.get(self.url()).json()['stats']['ratings_count'], 3)
+
+        self.author.profile.description = 'Nova descrição'
+        self.author.profile.save()
+        self.assertEqual(self.client.get(self.url()).json()['profile']['description'], 'Nova descrição')
+
+    def test_cached_profile_image_uses_each_request_host(self):
+        first = self.client.get(self.url(), HTTP_HOST='localhost').json()
+        second = self.client.get(self.url(), HTTP_HOST='127.0.0.1').json()
+        self.assertEqual(first['profile']['profileImage'], 'http://localhost/media/default/default_profile.svg')
+        self.assertEqual(second['profile']['profileImage'], 'http://127.0.0.1/media/default/default_profile.svg')
+
+    def test_unknown_author(self):
+        self.assertEqual(self.client.get(reverse('author_profile', args=['ninguem'])).status_code, 404)
+
+
+class AuthorStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        activity_buffer.drain()
+        self.author = User.objects.create_user(username='statsautor', password='12345')
+        self.fan = User.objects.create_user(username='statsfa', password='12345')
+
+    def tearDown(self):
+        activity_buffer.drain()
+
+    def create_recipe(self, index, author=None):
+        return make_recipe(author or self.author, title=f'Stats Recipe {index}')
+
+    def stats(self):
+        return AuthorStats.objects.get(author=self.author)
+
+    def test_write_paths_keep_stats_in_sync(self):
+        first, second = self.create_recipe(1), self.create_recipe(2)
+        save_rating(first, self.fan, 8)
+        save_rating(first, self.fan, 6)  # troca de nota não conta outra avaliação
+        save_rating(second, self.fan, 10)
+        for _ in range(3):
+            Recipe.objects.get(pk=first.pk).increment_views()
+        activity_buffer.flush()
+
+        stats = self.stats()
+        self.assertEqual(
+            (stats.recipes_count, stats.total_views, stats.ratings_count, stats.ratings_sum),
+            (2, 3, 2, 16),
+        )
+        self.assertEqual(stats.average_rating(), 8)
+
+        Recipe.objects.get(pk=first.pk).delete()
+        stats = self.stats()
+        self.assertEqual(
+            (stats.recipes_count, stats.total_views, stats.ratings_count, stats.ratings_sum),
+            (1, 0, 1, 10),
+        )
+        self.assertEqual(reconcile_author_stats(), (0, 0))
+
+    def test_bulk_created_recipes_are_counted(self):
+        self.create_recipe(1)
+        other = User.objects.create_user(username='statsoutro', password='12345')
+        Recipe.objects.bulk_create([
+            Recipe(author=self.author, views_count=5, **recipe_fields(title='Stats Lote 1')),
+            Recipe(author=self.author, views_count=2, **recipe_fields(title='Stats Lote 2')),
+            Recipe(author=other, **recipe_fields(title='Stats Lote 3')),
+        ])
+
+        self.assertEqual((self.stats().recipes_count, self.stats().total_views), (3, 7))
+        self.assertEqual(AuthorStats.objects.get(author=other).recipes_count, 1)
+        self.assertEqual(reconcile_author_stats(), (0, 0))
+
+    def test_reconcile_fixes_drift(self):
+        recipe = self.create_recipe(1)
+        save_rating(recipe, self.fan, 7)
+        Recipe.objects.filter(pk=recipe.pk).update(views_count=40)  # fora dos caminhos monitorados
+        AuthorStats.objects.filter(author=self.author).delete()
+        other = User.objects.create_user(username='statsoutro', password='12345')
+        self.create_recipe(2, author=other)
+        AuthorStats.objects.filter(author=other).update(recipes_count=5)
+
+        self.assertEqual(reconcile_author_stats(), (1, 1))
+        self.assertEqual(self.stats().total_views, 40)
+        self.assertEqual(AuthorStats.objects.get(author=other).recipes_count, 1)
+
+    def test_cascade_deleted_ratings_leave_histogram(self):
+        recipe = self.create_recipe(1)
+        save_rating(recipe, self.fan, 4)
+        other = User.objects.create_user(username='statsoutro', password='12345')
+        save_rating(recipe, other, 10)
+
+        User.objects.filter(pk=self.fan.pk).delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.total_ratings(), 1)
+        self.assertEqual(recipe.bayesian_rating, compute_bayesian_rating([0] * 9 + [1]))
+        self.assertEqual((self.stats().ratings_count, self.stats().ratings_sum), (1, 10))
+
+        other.delete()
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.total_ratings(), recipe.bayesian_rating), (0, 0))
+        self.assertEqual(reconcile_author_stats(), (0, 0))
+
+    def test_ratings_written_outside_save_rating_reach_histogram(self):
+        recipe = self.create_recipe(1)
+        rating = Rating.objects.create(recipe=recipe, user=self.fan, score=5)
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.average_rating(), recipe.total_ratings()), (5, 1))
+
+        rating = Rating.objects.get(pk=rating.pk)  # como o admin: carregada do banco e editada
+        rating.score = 9
+        rating.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.rating_distribution(), [0] * 8 + [1, 0])
+        self.assertEqual(recipe.bayesian_rating, compute_bayesian_rating([0] * 8 + [1, 0]))
+        self.assertEqual((self.stats().ratings_count, self.stats().ratings_sum), (1, 9))
+        self.assertEqual(RatingHistory.objects.filter(rating=rating).count(), 2)
+        self.assertEqual(rebuild_rating_histograms(), 0)
+        self.assertEqual(reconcile_author_stats(), (0, 0))
+
+    def test_rating_added_in_admin_reaches_histogram(self):
+        recipe = self.create_recipe(1)
+        admin = User.objects.create_superuser(username='statsadmin', password='12345', email='a@example.com')
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:recipes_rating_add'), {'recipe': recipe.pk, 'user': self.fan.pk, 'score': 7}
+        )
+        self.assertEqual(response.status_code, 302)
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.average_rating(), recipe.total_ratings()), (7, 1))
+
+    def test_deleting_author_with_rated_recipes(self):
+        recipe = self.create_recipe(1)
+        save_rating(recipe, self.fan, 9)
+        save_rating(self.create_recipe(2, author=self.fan), self.author, 5)
+        self.author.delete()
+        self.assertFalse(Recipe.objects.filter(pk=recipe.pk).exists())
+        self.assertFalse(AuthorStats.objects.filter(author_id=self.author.pk).exists())
+        self.assertEqual(reconcile_author_stats(), (0, 0))
+
+    def test_rebuild_histograms_fixes_drift(self):
+        recipe = self.create_recipe(1)
+        save_rating(recipe, self.fan, 8)
+        Rating.objects.filter(recipe=recipe).update(score=3)  # fora dos caminhos monitorados
+
+        self.assertEqual(rebuild_rating_histograms(), 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.rating_distribution(), [0, 0, 1] + [0] * 7)
+        self.assertEqual(rebuild_rating_histograms(), 0)
+
+    def test_top_authors_reads_only_stats(self):
+        other = User.objects.create_user(username='statsoutro', password='12345')
+        self.create_recipe(1)
+        self.create_recipe(2, author=other)
+        AuthorStats.objects.filter(author=other).update(total_views=100)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('top_authors'), {'limit': 5})
+        self.assertEqual([item['username'] for item in response.json()], ['statsoutro', 'statsautor'])
+        self.assertEqual(response.json()[0]['total_views'], 100)
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='timingautor', password='12345')
+        self.recipe = make_recipe(self.author, title='Timing Recipe')
+
+    def timing(self, response):
+        return dict(
+            (part.split(';')[0], part) for part in response['Server-Timing'].split(', ')
+        )
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_reports_db_cache_and_serializer(self):
+        staff = User.objects.create_user(username='timingstaff', password='12345', is_staff=True)
+        self.client.force_login(staff)
+        url = reverse('author_profile', args=[self.author.username])
+        with self.assertLogs('django', level='INFO') as logs:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+
+        timing = self.timing(response)
+        self.assertEqual(set(timing), {'total', 'db', 'cache', 'serializer'})
+        self.assertIn(f'desc="{len(ctx.captured_queries)} queries"', timing['db'])
+        self.assertIn('misses', timing['cache'])
+        record = next(r for r in logs.records if hasattr(r, 'perf'))
+        self.assertEqual(record.perf['route'], 'author_profile')
+        self.assertEqual(record.perf['db_queries'], len(ctx.captured_queries))
+        self.assertGreater(record.perf['cache_misses'], 0)
+
+        # Segunda requisição: página do autor vem do cache
+        response = self.client.get(url)
+        self.assertNotIn('0 hits', self.timing(response)['cache'])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_public_responses_have_no_header(self):
+        with self.assertLogs('django', level='INFO') as logs:
+            response = self.client.get(reverse('author_profile', args=[self.author.username]))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertTrue(any(hasattr(record, 'perf') for record in logs.records))
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_have_no_header(self):
+        response = self.client.get(reverse('author_profile', args=[self.author.username]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(METRICS_ENABLED=True, METRICS_DIR=self.tmp.name, METRICS_TOKEN='segredo')
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def tearDown(self):
+        metrics.registry.reset()
+
+    def scrape(self, **extra):
+        return self.client.get('/internal/metrics', **extra)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_requests_are_recorded_per_route(self):
+        for _ in range(2):
+            self.client.get(reverse('search_recipes'))
+        self.client.get(reverse('top_rated_recipes'))  # sem filtro: 400
+
+        body = self.scrape().content.decode()
+        self.assertIn('veg_http_requests_total{route="search_recipes",method="GET",status="200"} 2', body)
+        self.assertIn('veg_http_requests_total{route="top_rated_recipes",method="GET",status="400"} 1', body)
+        self.assertIn('veg_http_request_duration_seconds_count{route="search_recipes"} 2', body)
+        self.assertIn('veg_http_request_duration_seconds_bucket{route="search_recipes",le="+Inf"} 2', body)
+        self.assertIn('veg_db_queries_per_request_count{route="search_recipes"} 2', body)
+        self.assertIn('veg_cache_requests_total{route="search_recipes",result="miss"}', body)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_only_record_latency(self):
+        with mock.patch('backend.perf.collect') as collect:
+            self.client.get(reverse('search_recipes'))
+        collect.assert_not_called()
+
+        body = self.scrape().content.decode()
+        self.assertIn('veg_http_request_duration_seconds_count{route="search_recipes"} 1', body)
+        self.assertNotIn('veg_db_queries_per_request_count{route="search_recipes"}', body)
+        self.assertNotIn('veg_cache_requests_total{route="search_recipes"', body)
+
+    def test_files_from_other_workers_are_merged(self):
+        self.client.get(reverse('search_recipes'))
+        other = metrics.MetricsRegistry()
+        other.observe('search_recipes', 'GET', 200, 0.2)
+        other.flush(self.tmp.name)
+
+        body = self.scrape().content.decode()
+        self.assertIn('veg_http_requests_total{route="search_recipes",method="GET",status="200"} 2', body)
+        self.assertIn('veg_http_request_duration_seconds_bucket{route="search_recipes",le="0.25"} 2', body)
+
+    def test_endpoint_requires_internal_ip_or_token(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR='10.0.0.9').status_code, 403)
+        self.assertEqual(self.scrape(REMOTE_ADDR='10.0.0.9', HTTP_AUTHORIZATION='Bearer errado').status_code, 403)
+        response = self.scrape(REMOTE_ADDR='10.0.0.9', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+@unittest.skipIf(
+    connection.vendor == 'sqlite' and connection.is_in_memory_db(),
+    'SQLite em memória não é compartilhado entre threads',
+)
+class ConcurrentRatingTests(TransactionTestCase):
+    def test_simultaneous_raters_keep_histogram_consistent(self):
+        author = User.objects.create_user(username='concurrentauthor', password='12345')
+        recipe = make_recipe(author, title='Concurrent Recipe')
+        raters = [User.objects.create_user(username=f'rater{index}', password='12345') for index in range(8)]
+        barrier = threading.Barrier(len(raters) * 2)
+        errors = []
+
+        def rate(user, score):
+            try:
+                barrier.wait()
+                save_rating(Recipe.objects.get(pk=recipe.pk), user, score)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        # Cada usuário clica duas vezes ao mesmo tempo (notas 7 e 7)
+        threads = [threading.Thread(target=rate, args=(user, 7)) for user in raters for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        activity_buffer.drain()
+
+        self.assertEqual(errors, [])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.total_ratings(), len(raters))
+        self.assertEqual(recipe.rating_distribution()[6], len(raters))
+        self.assertEqual(RatingHistory.objects.filter(rating__recipe=recipe).count(), len(raters) * 2)
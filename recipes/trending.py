@@ -0,0 +1,99 @@
+"""
+Pontuação de tendência das receitas.
+
+A atividade (visualizações e avaliações) é acumulada em baldes diários
+(RecipeDailyStats, alimentados por recipes.rollups). A pontuação de uma receita é a soma dos baldes com
+decaimento exponencial pela idade do balde:
+
+    score = sum(valor_do_dia * 0.5 ** (idade_em_dias / meia_vida))
+
+O job update_trending_scores é incremental: só recalcula as receitas que
+tiveram atividade desde a última pontuação (trending_day) e aplica às demais
+apenas o fator de decaimento, com um UPDATE por dia distinto.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Recipe, RecipeDailyStats
+
+DEFAULT_HALF_LIFE_DAYS = 3
+DEFAULT_WINDOW_DAYS = 28
+DEFAULT_RATING_WEIGHT = 5
+# Pontuações abaixo deste valor são zeradas para não decair para sempre
+MIN_SCORE = 0.01
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def bucket_value(visitors, ratings_count, ratings_sum):
+    """Valor de um balde diário: visitantes mais avaliações ponderadas pela nota"""
+    weight = _setting('TRENDING_RATING_WEIGHT', DEFAULT_RATING_WEIGHT)
+    return visitors + weight * ratings_sum / 10
+
+
+def decay_factor(days):
+    half_life = _setting('TRENDING_HALF_LIFE_DAYS', DEFAULT_HALF_LIFE_DAYS)
+    return 0.5 ** (days / half_life)
+
+
+def update_trending_scores(today=None):
+    """
+    Atualiza trending_score de forma incremental.
+
+    Retorna a quantidade de receitas recalculadas e de receitas apenas decaídas.
+    """
+    today = today or timezone.localdate()
+    window_start = today - timedelta(days=_setting('TRENDING_WINDOW_DAYS', DEFAULT_WINDOW_DAYS))
+
+    # 1. Receitas com atividade desde a última pontuação
+    active_ids = set(
+        RecipeDailyStats.objects.filter(day__gte=window_start)
+        .filter(Q(recipe__trending_day__isnull=True) | Q(day__gte=F('recipe__trending_day')))
+        .values_list('recipe_id', flat=True).distinct()
+    )
+
+    scores = defaultdict(float)
+    buckets = RecipeDailyStats.objects.filter(recipe_id__in=active_ids, day__gte=window_start)\
+        .values_list('recipe_id', 'day', 'views', 'unique_visitors', 'ratings_count', 'ratings_sum')
+    for recipe_id, day, views, unique_visitors, ratings_count, ratings_sum in buckets.iterator():
+        # Visitantes únicos quando há esboço; senão, visualizações brutas
+        visitors = unique_visitors or views
+        scores[recipe_id] += bucket_value(visitors, ratings_count, ratings_sum) * decay_factor((today - day).days)
+
+    recipes = [
+        Recipe(pk=recipe_id, trending_score=scores[recipe_id], trending_day=today)
+        for recipe_id in active_ids
+    ]
+    Recipe.objects.bulk_update(recipes, ['trending_score', 'trending_day'], batch_size=500)
+
+    # 2. Demais receitas pontuadas: apenas decaimento, um UPDATE por dia distinto
+    decayed = 0
+    stale_days = Recipe.objects.filter(trending_score__gt=0, trending_day__lt=today)\
+        .order_by().values_list('trending_day', flat=True).distinct()
+    for day in list(stale_days):
+        decayed += Recipe.objects.filter(trending_score__gt=0, trending_day=day).update(
+            trending_score=F('trending_score') * decay_factor((today - day).days),
+            trending_day=today,
+        )
+    Recipe.objects.filter(trending_score__gt=0, trending_score__lt=MIN_SCORE).update(trending_score=0)
+
+    return len(recipes), decayed
+
+
+def featured_queryset(queryset=None):
+    """Destaques: receitas em alta, com desempate por visualizações e pela média bayesiana"""
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    return queryset.order_by('-trending_score', '-views_count', '-bayesian_rating')
+
+
+def trending_queryset(queryset=None, recipe_class=None):
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    if recipe_class:
+        queryset = queryset.filter(recipe_class=recipe_class)
+    return queryset.filter(trending_score__gt=0).order_by('-trending_score', '-views_count')
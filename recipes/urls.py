@@ -7,13 +7,21 @@ router.register(r'recipes', views.RecipeViewSet)
 
 urlpatterns = [
     # Rotas específicas devem vir ANTES do router para evitar conflitos
+    path('recipes/home/', views.home_bundle, name='home_bundle'),
     path('recipes/featured/', views.featured_recipes, name='featured_recipes'),
+    path('recipes/trending/', views.trending_recipes, name='trending_recipes'),
+    path('recipes/top-rated/', views.top_rated_recipes, name='top_rated_recipes'),
+    path('recipes/batch/', views.batch_recipes, name='batch_recipes'),
+    path('recipes/analytics/', views.author_analytics, name='author_analytics'),
     path('recipes/search/', views.search_recipes, name='search_recipes'),
     path('recipes/genres/suggest/', views.suggest_tags, name='suggest_tags'),
     path('recipes/categories/', views.get_categories, name='get_categories'),
     path('recipes/<int:recipe_id>/rate/', views.rate_recipe, name='rate_recipe'),
     path('recipes/<int:recipe_id>/ratings/', views.get_recipe_ratings, name='get_recipe_ratings'),
+    path('recipes/ratings/batch/', views.batch_recipe_ratings, name='batch_recipe_ratings'),
     path('recipes/user/<int:user_id>/', views.user_recipes, name='user_recipes'),
+    path('recipes/authors/top/', views.top_authors_view, name='top_authors'),
+    path('recipes/authors/<str:username>/', views.author_profile, name='author_profile'),
     path('recipes/by-slug/<slug:slug>/', views.recipe_by_slug, name='recipe_by_slug'),
     # Router deve vir por último para não capturar as rotas específicas
     path('', include(router.urls)),
@@ -4,16 +4,41 @@ from rest_framework.decorators import api_view, action, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from .models import Recipe, Rating, RecipeImage
+from .models import (
+    Recipe, Rating, RecipeImage, RecipeDailyStats, RecipeSlugHistory,
+    unpack_rating_histogram, rating_histogram_stats,
+    RECIPE_CLASS_CHOICES, STYLE_CHOICES
+)
 from users.models import UserProfile
 from .serializers import (
-    RecipeSerializer, RatingSerializer, UserProfileSerializer,
+    RecipeSerializer, RecipeSummarySerializer, RatingSerializer, UserProfileSerializer,
     UserSerializer
 )
 from rest_framework.views import APIView
-from django.db.models import Avg, Q
+from rest_framework.pagination import PageNumberPagination
+from django.db.models import Avg, Q, Sum
 from django.contrib.auth.models import User
+from django.http import Http404, HttpResponse, HttpResponseNotModified, HttpResponsePermanentRedirect
+from django.urls import reverse
+from django.utils.http import parse_etags
+from django.utils.dateparse import parse_date
+from django.utils import timezone
+from datetime import timedelta
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
 from rest_framework import permissions
+from backend.cache_control_middleware import cache_policy
+from .taxonomy import get_compiled_taxonomy
+from .home import FEATURED_LIMIT, get_home_bundle, summary_queryset
+from .trending import featured_queryset, trending_queryset
+from .leaderboards import get_leaderboard, LEADERBOARD_SIZE
+from .slugs import resolve_slug, invalidate_slugs
+from .querysets import detail_queryset
+from .profiles import get_author_profile
+from .authors import serialize_author_stats, top_authors
+from .rollups import visitor_id
+from .ratings import save_rating
+from .hll import HyperLogLog
 
 
 
@@ -33,25 +58,108 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import ValidationError
             raise ValidationError('Já existe um perfil para este usuário.')
 
+def _redirect_to_slug(request, url_name, slug):
+    url = reverse(url_name, args=[slug])
+    if request.META.get('QUERY_STRING'):
+        url = f"{url}?{request.META['QUERY_STRING']}"
+    return HttpResponsePermanentRedirect(url)
+
+
+@never_cache
 @api_view(['GET'])
 def recipe_by_slug(request, slug):
-    """Endpoint para buscar uma receita pelo seu slug"""
+    """
+    Endpoint para buscar uma receita pelo seu slug.
+
+    Slugs antigos de receitas renomeadas respondem com 301 para o slug atual.
+    A resposta nunca é guardada por CDN ou navegador: cada leitura precisa
+    chegar aqui para contar a visualização.
+    """
+    entry = resolve_slug(slug)
+    if entry is None:
+        return Response({"error": "Receita não encontrada"}, status=status.HTTP_404_NOT_FOUND)
+    if entry.slug != slug:
+        return _redirect_to_slug(request, 'recipe_by_slug', entry.slug)
     try:
-        recipe = Recipe.objects.get(slug=slug)
-        recipe.increment_views()
+        recipe = Recipe.objects.get(pk=entry.id)
+        recipe.increment_views(visitor_id(request))
         serializer = RecipeSerializer(recipe, context={'request': request})
         return Response(serializer.data)
     except Recipe.DoesNotExist:
+        # Entrada antiga no cache local de outro worker
+        invalidate_slugs(slug)
         return Response({"error": "Receita não encontrada"}, status=status.HTTP_404_NOT_FOUND)
 
+class RecipePagination(PageNumberPagination):
+    """
+    Paginação opcional: só vale quando a requisição pede page ou limit.
+
+    Sem esses parâmetros a resposta mantém o formato antigo (lista simples),
+    para não quebrar clientes que ainda esperam a lista completa.
+    """
+    page_size = 30
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    @classmethod
+    def is_requested(cls, request):
+        return cls.page_query_param in request.query_params or cls.page_size_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        # Mesmo formato da busca (search_recipes)
+        return Response({
+            'results': data,
+            'count': self.page.paginator.count,
+            'total_pages': self.page.paginator.num_pages,
+            'current_page': self.page.number,
+        })
+
+
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.annotate(
-        average_rating=Avg('ratings__score')
-    ).order_by('-average_rating')
+    queryset = Recipe.objects.all()
     lookup_field = 'slug'  # Usar slug como campo de busca ao invés de id
     serializer_class = RecipeSerializer
     parser_classes = [MultiPartParser, FormParser, JSONParser]  # Suporte para uploads de arquivos
     permission_classes = [IsAuthenticated]  # Exigir autenticação para todas as operações
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        """
+        Queryset por ação. Nenhuma agrupa ratings: a média vem do histograma.
+
+        - list: ordenada pela média bayesiana desnormalizada (as mais bem
+          avaliadas primeiro, como a ordenação antiga por média) e paginada
+          quando a requisição pede page ou limit;
+        - retrieve e similar: plano completo (autor, perfil e imagens), com a
+          média lida do histograma;
+        - escrita (update, destroy, rate, update_images): busca simples pelo slug.
+        """
+        if self.action == 'list':
+            return detail_queryset().order_by('-bayesian_rating', '-id')
+        if self.action in ('retrieve', 'similar'):
+            return detail_queryset()
+        return Recipe.objects.all()
+
+    def get_object(self):
+        # Resolver o slug pelo cache (slug atual ou antigo) e buscar pelo id
+        entry = resolve_slug(self.kwargs[self.lookup_field])
+        if entry is None:
+            raise Http404
+        obj = get_object_or_404(self.filter_queryset(self.get_queryset()), pk=entry.id)
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def retrieve(self, request, *args, **kwargs):
+        slug = kwargs[self.lookup_field]
+        entry = resolve_slug(slug)
+        if entry is not None and entry.slug != slug:
+            return _redirect_to_slug(request, 'recipe-detail', entry.slug)
+        return super().retrieve(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         # Adicionar logs detalhados para depuração de CSRF
@@ -201,26 +309,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rating, created = Rating.objects.update_or_create(
-            recipe=recipe,
-            user=request.user,
-            defaults={'score': score}
-        )
+        result = save_rating(recipe, request.user, score)
         
         return Response({
-            'rating': RatingSerializer(rating).data,
-            'average_rating': recipe.average_rating
+            'rating': RatingSerializer(result.rating).data,
+            'average_rating': result.average_rating,
+            'total_ratings': result.total_ratings,
+            'rating_distribution': result.distribution
         })
 
     @action(detail=True, methods=['get'])
     def similar(self, request, slug=None):
         recipe = self.get_object()
-        similar_recipes = Recipe.objects.filter(
+        similar_recipes = detail_queryset().filter(
             Q(recipe_class=recipe.recipe_class) |
-            Q(recipe_genre=recipe.recipe_genre)
-        ).exclude(id=recipe.id).annotate(
-            avg_rating=Avg('ratings__score')
-        ).order_by('-avg_rating')[:4]
+            Q(genre=recipe.genre)
+        ).exclude(id=recipe.id).order_by('-bayesian_rating')[:4]
         
         serializer = self.get_serializer(similar_recipes, many=True)
         return Response(serializer.data)
@@ -228,6 +332,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
 
 
+@cache_policy(max_age=30, stale_while_revalidate=120)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def search_recipes(request):
@@ -330,6 +435,13 @@ def user_recipes(request, user_id):
     except User.DoesNotExist:
         return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
     
+    # Com ?page= a lista é paginada e compacta (páginas seguintes da página do autor)
+    if 'page' in request.GET:
+        recipes = summary_queryset().filter(author=user).order_by('-created_at', '-id')
+        paginator = RecipePagination()
+        page = paginator.paginate_queryset(recipes, request)
+        return paginator.get_paginated_response(RecipeSummarySerializer(page, many=True).data)
+
     recipes = Recipe.objects.filter(author=user).annotate(
         average_rating=Avg('ratings__score')
     ).order_by('-created_at')
@@ -337,23 +449,64 @@ def user_recipes(request, user_id):
     serializer = RecipeSerializer(recipes, many=True, context={'request': request})
     return Response(serializer.data)
 
+
+TOP_AUTHORS_MAX = 50
+
+
+@cache_policy(max_age=300, stale_while_revalidate=900)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def top_authors_view(request):
+    """Autores mais vistos, lidos de AuthorStats (sem agregar Recipe e Rating)"""
+    try:
+        limit = min(int(request.GET.get('limit', 10)), TOP_AUTHORS_MAX)
+    except ValueError:
+        return Response({'error': 'limit deve ser um número inteiro'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response([
+        {'id': stats.author_id, 'username': stats.author.username, **serialize_author_stats(stats)}
+        for stats in top_authors(limit)
+    ])
+
+
+@cache_policy(max_age=60, stale_while_revalidate=300)
 @api_view(['GET'])
+@permission_classes([AllowAny])
+def author_profile(request, username):
+    """
+    Página pública do autor: perfil, estatísticas e a primeira página das receitas.
+
+    As páginas seguintes vêm de user_recipes com ?page=. O resultado fica em
+    cache por autor (recipes.profiles).
+    """
+    user = User.objects.select_related('profile').filter(username=username).first()
+    if user is None:
+        return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    if not hasattr(user, 'profile'):
+        return Response({'error': 'Perfil não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(get_author_profile(user, request))
+
+@cache_policy(max_age=86400, stale_while_revalidate=604800)
+@require_GET
 def get_categories(request):
-    return Response({
-        'classes': [
-            {'value': 'gourmet', 'label': 'Gourmet'},
-            {'value': 'caseira', 'label': 'Caseira'}
-        ],
-
-        'genres': [
-            {'value': 'entrada', 'label': 'Entrada'},
-            {'value': 'prato_principal', 'label': 'Prato Principal'},
-            {'value': 'sobremesa', 'label': 'Sobremesa'}
-        ]
-    })
+    """
+    Taxonomia das receitas gerada a partir das choices do modelo.
+
+    O corpo já vem codificado e com ETag forte, então a view não passa pelo
+    DRF e responde 304 quando o cliente já tem a versão atual; por isso o
+    max-age pode ser longo.
+    """
+    taxonomy = get_compiled_taxonomy()
+
+    if taxonomy.etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(taxonomy.body, content_type='application/json')
+    response['ETag'] = taxonomy.etag
+    return response
 
 @api_view(['POST'])
-@permission_classes([AllowAny])
+@permission_classes([IsAuthenticated])
 def rate_recipe(request, recipe_id):
     try:
         recipe = Recipe.objects.get(id=recipe_id)
@@ -365,15 +518,12 @@ def rate_recipe(request, recipe_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        rating, created = Rating.objects.update_or_create(
-            recipe=recipe,
-            user=request.user,
-            defaults={'score': score}
-        )
+        result = save_rating(recipe, request.user, score)
 
         return Response({
-            'average_rating': recipe.average_rating,
-            'total_ratings': recipe.total_ratings,
+            'average_rating': result.average_rating,
+            'total_ratings': result.total_ratings,
+            'rating_distribution': result.distribution,
             'user_rating': score
         })
     except Recipe.DoesNotExist:
@@ -396,8 +546,9 @@ def get_recipe_ratings(request, recipe_id):
             user_rating = rating.score if rating else None
 
         return Response({
-            'average_rating': recipe.average_rating,
-            'total_ratings': recipe.total_ratings,
+            'average_rating': recipe.average_rating(),
+            'total_ratings': recipe.total_ratings(),
+            'rating_distribution': recipe.rating_distribution(),
             'user_rating': user_rating
         })
     except Recipe.DoesNotExist:
@@ -407,18 +558,144 @@ def get_recipe_ratings(request, recipe_id):
         )
 
 
+BATCH_RATINGS_MAX_ITEMS = 100
+
+
+def _split_param(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def batch_recipe_ratings(request):
+    """
+    Média, total e nota do usuário para várias receitas de uma vez.
+
+    Recebe ids e/ou slugs separados por vírgula (?ids=1,2&slugs=bolo,torta) e
+    faz apenas duas consultas: uma nas receitas, lendo o histograma
+    desnormalizado, e outra nas avaliações do usuário autenticado.
+    """
+    try:
+        ids = [int(value) for value in _split_param(request.GET.get('ids', ''))]
+    except ValueError:
+        return Response({'error': 'ids deve conter apenas números inteiros'}, status=status.HTTP_400_BAD_REQUEST)
+    slugs = _split_param(request.GET.get('slugs', ''))
+
+    if not ids and not slugs:
+        return Response({'error': 'Informe ids ou slugs'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) + len(slugs) > BATCH_RATINGS_MAX_ITEMS:
+        return Response(
+            {'error': f'Máximo de {BATCH_RATINGS_MAX_ITEMS} receitas por requisição'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    rows = Recipe.objects.filter(Q(id__in=ids) | Q(slug__in=slugs))\
+        .values_list('id', 'slug', 'rating_histogram')
+    recipes = {}
+    for recipe_id, slug, histogram in rows:
+        average, total = rating_histogram_stats(unpack_rating_histogram(histogram))
+        recipes[recipe_id] = {
+            'id': recipe_id,
+            'slug': slug,
+            'average_rating': average,
+            'total_ratings': total,
+            'user_rating': None,
+        }
+
+    if request.user.is_authenticated and recipes:
+        user_ratings = Rating.objects.filter(user=request.user, recipe_id__in=recipes.keys())\
+            .values_list('recipe_id', 'score')
+        for recipe_id, score in user_ratings:
+            recipes[recipe_id]['user_rating'] = score
+
+    by_slug = {item['slug']: item for item in recipes.values()}
+    results = []
+    missing = []
+    for key in ids + slugs:
+        item = recipes.get(key) if isinstance(key, int) else by_slug.get(key)
+        if item is None:
+            missing.append(key)
+        else:
+            results.append(item)
+
+    return Response({'results': results, 'missing': missing})
+
+
+BATCH_RECIPES_MAX_ITEMS = 50
+
+
+@cache_policy(max_age=60, stale_while_revalidate=300)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def batch_recipes(request):
+    """
+    Várias receitas completas em uma requisição (?ids=1,2&slugs=bolo,torta).
+
+    Mantém a ordem pedida (ids e depois slugs), lista em 'missing' o que não
+    foi encontrado e aceita ?fields=id,title,... para devolver apenas parte
+    dos campos. Slugs antigos de receitas renomeadas são resolvidos pelo
+    histórico. Não incrementa as visualizações.
+    """
+    try:
+        ids = [int(value) for value in _split_param(request.GET.get('ids', ''))]
+    except ValueError:
+        return Response({'error': 'ids deve conter apenas números inteiros'}, status=status.HTTP_400_BAD_REQUEST)
+    slugs = _split_param(request.GET.get('slugs', ''))
+
+    if not ids and not slugs:
+        return Response({'error': 'Informe ids ou slugs'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) + len(slugs) > BATCH_RECIPES_MAX_ITEMS:
+        return Response(
+            {'error': f'Máximo de {BATCH_RECIPES_MAX_ITEMS} receitas por requisição'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fields = _split_param(request.GET.get('fields', '')) or None
+    if fields is not None:
+        unknown = set(fields) - set(RecipeSerializer.Meta.fields)
+        if unknown:
+            return Response(
+                {'error': f"Campos desconhecidos: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    queryset = detail_queryset(fields)
+    recipes = {recipe.id: recipe for recipe in queryset.filter(Q(id__in=ids) | Q(slug__in=slugs))}
+    by_slug = {recipe.slug: recipe for recipe in recipes.values()}
+
+    # Slugs não encontrados podem ser de receitas renomeadas
+    unresolved = [slug for slug in slugs if slug not in by_slug]
+    if unresolved:
+        renamed = dict(RecipeSlugHistory.objects.filter(slug__in=unresolved).values_list('slug', 'recipe_id'))
+        if renamed:
+            pending = set(renamed.values()) - recipes.keys()
+            recipes.update((recipe.id, recipe) for recipe in queryset.filter(id__in=pending))
+            by_slug.update(
+                (slug, recipes[recipe_id]) for slug, recipe_id in renamed.items() if recipe_id in recipes
+            )
+
+    found = []
+    missing = []
+    for key in ids + slugs:
+        recipe = recipes.get(key) if isinstance(key, int) else by_slug.get(key)
+        if recipe is None:
+            missing.append(key)
+        else:
+            found.append(recipe)
+
+    serializer = RecipeSerializer(found, many=True, fields=fields, context={'request': request})
+    return Response({'results': serializer.data, 'missing': missing})
+
+
+@cache_policy(max_age=60, stale_while_revalidate=300)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def featured_recipes(request):
     try:
-        # Como o campo is_featured não existe mais, vamos selecionar as receitas mais populares
-        # baseado em visualizações ou avaliações
-        recipes = Recipe.objects.all()\
-            .select_related('author')\
-            .prefetch_related('ratings', 'images')\
-            .annotate(average_rating=Avg('ratings__score'))\
-            .order_by('-views_count', '-average_rating')[:5]
-            
+        # Como o campo is_featured não existe mais, vamos selecionar as receitas em alta
+        # pela pontuação de tendência (visualizações e avaliações recentes)
+        recipes = featured_queryset(detail_queryset())[:FEATURED_LIMIT]
+
         # Garantir que o contexto da requisição seja passado para o serializer
         serializer = RecipeSerializer(recipes, many=True, context={'request': request})
         return Response(serializer.data)
@@ -428,3 +705,133 @@ def featured_recipes(request):
         logger = logging.getLogger('django')
         logger.error(f"Erro ao buscar receitas em destaque: {str(e)}")
         return Response({'error': 'Erro ao processar receitas em destaque'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@cache_policy(max_age=60, stale_while_revalidate=300)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def trending_recipes(request):
+    """Lista de receitas em alta, opcionalmente filtrada por recipe_class"""
+    recipe_class = request.GET.get('recipe_class', '')
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        return Response({'error': 'limit deve ser um número inteiro'}, status=status.HTTP_400_BAD_REQUEST)
+
+    recipes = trending_queryset(summary_queryset(), recipe_class=recipe_class)[:limit]
+    serializer = RecipeSummarySerializer(recipes, many=True)
+    return Response(serializer.data)
+
+
+@cache_policy(max_age=60, stale_while_revalidate=300)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def top_rated_recipes(request):
+    """
+    Receitas mais bem avaliadas (média bayesiana) de uma recipe_class ou de um style.
+
+    A ordem vem do ranking em cache (recipes.leaderboards); o banco só é
+    consultado para carregar os resumos das receitas do ranking.
+    """
+    filters_by_field = {
+        'recipe_class': dict(RECIPE_CLASS_CHOICES),
+        'style': dict(STYLE_CHOICES),
+    }
+    field = next((name for name in filters_by_field if request.GET.get(name)), None)
+    if field is None:
+        return Response(
+            {'error': 'Informe recipe_class ou style'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    value = request.GET[field]
+    if value not in filters_by_field[field]:
+        return Response({'error': f'{field} inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(int(request.GET.get('limit', 10)), LEADERBOARD_SIZE)
+    except ValueError:
+        return Response({'error': 'limit deve ser um número inteiro'}, status=status.HTTP_400_BAD_REQUEST)
+
+    entries = get_leaderboard(field, value)[:limit]
+    recipes = summary_queryset().in_bulk([recipe_id for recipe_id, _ in entries])
+
+    results = []
+    for recipe_id, score in entries:
+        recipe = recipes.get(recipe_id)
+        # Receita excluída ou movida de classe/estilo depois de entrar no ranking
+        if recipe is None or getattr(recipe, field) != value:
+            continue
+        data = RecipeSummarySerializer(recipe).data
+        data['bayesian_rating'] = round(score, 2)
+        results.append(data)
+    return Response(results)
+
+
+@cache_policy(max_age=60, stale_while_revalidate=300)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def home_bundle(request):
+    """Retorna todas as seções da página inicial em uma única resposta"""
+    return Response(get_home_bundle())
+
+
+ANALYTICS_MAX_DAYS = 366
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def author_analytics(request):
+    """
+    Visualizações e avaliações por dia das receitas do autor autenticado.
+
+    Lê apenas os agregados diários, então o custo depende do intervalo pedido
+    e não do histórico total. Parâmetros: start, end (YYYY-MM-DD) e recipe (slug).
+    """
+    today = timezone.localdate()
+    try:
+        end = parse_date(request.GET.get('end', '')) or today
+        start = parse_date(request.GET.get('start', '')) or end - timedelta(days=6)
+    except ValueError:
+        # Formato válido mas data inexistente (ex.: 2024-02-30)
+        return Response({'error': 'Data inválida'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if start > end:
+        return Response({'error': 'start deve ser anterior a end'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end - start).days >= ANALYTICS_MAX_DAYS:
+        return Response(
+            {'error': f'O intervalo máximo é de {ANALYTICS_MAX_DAYS} dias'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    stats = RecipeDailyStats.objects.filter(recipe__author=request.user, day__range=(start, end))
+    recipe_slug = request.GET.get('recipe')
+    if recipe_slug:
+        stats = stats.filter(recipe__slug=recipe_slug)
+
+    days = list(
+        stats.values('day')
+        .annotate(
+            views=Sum('views'), unique_visitors=Sum('unique_visitors'),
+            ratings_count=Sum('ratings_count'), ratings_sum=Sum('ratings_sum')
+        )
+        .order_by('day')
+    )
+
+    totals = {'views': 0, 'ratings_count': 0, 'ratings_sum': 0}
+    for row in days:
+        for field in totals:
+            totals[field] += row[field]
+        row['average_rating'] = row['ratings_sum'] / row['ratings_count'] if row['ratings_count'] else None
+    totals['average_rating'] = totals['ratings_sum'] / totals['ratings_count'] if totals['ratings_count'] else None
+    # Visitantes únicos do intervalo: os esboços diários são combinados, não somados
+    totals['unique_visitors'] = HyperLogLog.merged(
+        stats.exclude(visitors_sketch=None).values_list('visitors_sketch', flat=True)
+    ).count()
+
+    return Response({
+        'start': start,
+        'end': end,
+        'recipe': recipe_slug,
+        'days': days,
+        'totals': totals,
+    })
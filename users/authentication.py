@@ -0,0 +1,119 @@
+"""
+Autenticação JWT com o usuário (e o perfil) guardados em cache.
+
+O JWTAuthentication padrão busca o User no banco a cada requisição, e os
+serializers ainda carregam user.profile em seguida. Aqui o usuário é lido do
+cache, já com o perfil anexado, numa chave com o id do usuário e a versão
+atual do cache desse usuário. invalidate_cached_user incrementa a versão (via
+sinais de User e UserProfile), então uma requisição que carregou o usuário do
+banco antes da alteração grava numa versão que ninguém mais lê.
+
+Nos outros workers, um usuário desativado ou com senha trocada continua
+autenticado por até AUTH_USER_CACHE_TTL segundos (veja a nota sobre CACHES em
+backend/settings.py).
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+DEFAULT_USER_CACHE_TTL = 10
+
+
+def _version_key(user_id):
+    return f'auth:user-version:{user_id}'
+
+
+def _user_key(user_id, version):
+    return f'auth:user:{user_id}:{version}'
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+stats = _Stats()
+
+
+def get_cached_user(user_id):
+    """Retorna o usuário com o perfil carregado, ou None se não existir"""
+    version = cache.get(_version_key(user_id), 0)
+    key = _user_key(user_id, version)
+    user = cache.get(key)
+    stats.record(user is not None)
+    if user is None:
+        try:
+            user = User.objects.select_related('profile').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TTL', DEFAULT_USER_CACHE_TTL))
+    return user
+
+
+def invalidate_cached_user(user_id):
+    key = _version_key(user_id)
+    if not cache.add(key, 1):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # A chave expirou entre o add e o incr
+            cache.set(key, 1)
+
+
+def auth_cache_stats():
+    """Acertos e faltas do cache de usuários neste processo"""
+    return stats.snapshot()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que resolve o usuário pelo cache (ver get_cached_user)"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed'
+                )
+
+        return user
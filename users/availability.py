@@ -0,0 +1,182 @@
+"""
+Disponibilidade de nomes de usuário e emails para o formulário de cadastro.
+
+Cada worker mantém um filtro de Bloom com os nomes de usuário e emails já
+cadastrados (em minúsculas). Uma resposta negativa do filtro é definitiva e
+dispensa o banco; uma positiva pode ser falso positivo e é confirmada com uma
+consulta. O filtro é montado quando o worker sobe (hook post_worker_init em
+gunicorn.conf.py, ver warm_up) e recebe os cadastros feitos no próprio worker
+pelo post_save de User. Para incluir os cadastros dos outros workers ele é
+remontado a cada AVAILABILITY_REFRESH_SECONDS numa thread de fundo: a
+requisição que nota a expiração continua usando o filtro atual, e sem filtro
+nenhum a resposta vem direto do banco. Nenhuma requisição percorre auth_user.
+A validação do register_user continua sendo a palavra final.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
+
+from .models import users_with_email
+
+logger = logging.getLogger('django')
+
+DEFAULT_CAPACITY = 100000
+DEFAULT_ERROR_RATE = 0.01
+DEFAULT_REFRESH_SECONDS = 300
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # Hash duplo (Kirsch-Mitzenmacher) a partir de um único blake2b
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+def _username_key(username):
+    return f'u:{username.strip().lower()}'
+
+
+def _email_key(email):
+    return f'e:{email.strip().lower()}'
+
+
+_lock = threading.Lock()
+_filter = None
+_built_at = 0
+_refreshing = False
+_added_during_refresh = []
+
+
+def build_filter():
+    total = User.objects.count()
+    capacity = max(getattr(settings, 'AVAILABILITY_BLOOM_CAPACITY', DEFAULT_CAPACITY), total * 2)
+    bloom = BloomFilter(capacity, getattr(settings, 'AVAILABILITY_BLOOM_ERROR_RATE', DEFAULT_ERROR_RATE))
+    for username, email in User.objects.values_list('username', 'email').iterator(chunk_size=2000):
+        bloom.add(_username_key(username))
+        if email:
+            bloom.add(_email_key(email))
+    return bloom
+
+
+def _add_keys(bloom, keys):
+    for key in keys:
+        bloom.add(key)
+
+
+def rebuild():
+    """Monta um filtro novo e o coloca no lugar do atual"""
+    global _filter, _built_at, _refreshing
+    with _lock:
+        _refreshing = True
+        _added_during_refresh.clear()
+    try:
+        bloom = build_filter()
+    except BaseException:
+        with _lock:
+            _refreshing = False
+        raise
+    with _lock:
+        # Cadastros gravados durante a varredura podem ter ficado de fora dela
+        _add_keys(bloom, _added_during_refresh)
+        _added_during_refresh.clear()
+        _filter, _built_at, _refreshing = bloom, time.monotonic(), False
+    return bloom
+
+
+def _refresh_in_background():
+    try:
+        rebuild()
+    except DatabaseError as e:
+        logger.error(f"Erro ao remontar o filtro de disponibilidade: {str(e)}")
+    finally:
+        connection.close()  # conexão própria desta thread
+
+
+def _start_refresh():
+    threading.Thread(target=_refresh_in_background, name='availability-refresh', daemon=True).start()
+
+
+def get_filter():
+    """Filtro atual (ou None); se expirou, agenda a remontagem em segundo plano"""
+    global _refreshing
+    refresh = getattr(settings, 'AVAILABILITY_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+    with _lock:
+        expired = _filter is None or time.monotonic() - _built_at > refresh
+        start = expired and not _refreshing
+        if start:
+            _refreshing = True
+    if start:
+        _start_refresh()
+    return _filter
+
+
+def warm_up():
+    """Monta o filtro fora de uma requisição; se o banco falhar, a remontagem fica para depois"""
+    try:
+        rebuild()
+    except DatabaseError as e:
+        logger.error(f"Erro ao montar o filtro de disponibilidade: {str(e)}")
+
+
+def add_user(user):
+    """Inclui um usuário no filtro deste worker (chamado pelo post_save de User)"""
+    global _built_at
+    keys = [_username_key(user.username)]
+    if user.email:
+        keys.append(_email_key(user.email))
+    with _lock:
+        if _refreshing:
+            _added_during_refresh.extend(keys)
+        if _filter is None:
+            return
+        _add_keys(_filter, keys)
+        if _filter.count > _filter.capacity:
+            # Filtro cheio: a taxa de falsos positivos sobe; remontar na próxima consulta
+            _built_at = 0
+
+
+def reset():
+    global _filter, _built_at, _refreshing
+    with _lock:
+        _filter, _built_at, _refreshing = None, 0, False
+        _added_during_refresh.clear()
+
+
+def _might_exist(key):
+    bloom = get_filter()
+    return bloom is None or key in bloom
+
+
+def username_available(username):
+    if not _might_exist(_username_key(username)):
+        return True
+    return not User.objects.filter(username=username.strip()).exists()
+
+
+def email_available(email):
+    if not _might_exist(_email_key(email)):
+        return True
+    return not users_with_email(email).exists()
@@ -0,0 +1,108 @@
+"""
+Hash de senhas fora das threads que atendem requisições.
+
+PBKDF2 leva dezenas de milissegundos de CPU por senha. Aqui o hash roda em um
+pool pequeno de threads (hashlib libera o GIL durante o PBKDF2), de modo que
+uma rajada de logins ocupa no máximo PASSWORD_HASH_WORKERS núcleos e as demais
+threads do worker gthread continuam servindo leituras.
+
+O controle de admissão limita quantas operações podem estar no pool
+(executando ou na fila). O limite é o menor entre PASSWORD_HASH_MAX_PENDING e
+o número de threads de requisição do worker menos uma (GUNICORN_THREADS - 1):
+como quem chama espera o resultado do hash, logins nunca ocupam todas as
+threads e sempre sobra ao menos uma para leituras. Sem vaga, HashingBusy é
+levantada na hora (esperar por uma vaga também prenderia a thread) e as
+views respondem 503 com Retry-After.
+
+As views de autenticação são síncronas (DRF @api_view), então não há versão
+assíncrona do pool.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 16
+DEFAULT_REQUEST_THREADS = 4
+RETRY_AFTER_SECONDS = 2
+
+
+class HashingBusy(Exception):
+    """Todas as vagas do pool de hash estão ocupadas"""
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', DEFAULT_WORKERS),
+    thread_name_prefix='password-hash',
+)
+
+
+def admission_limit():
+    """Vagas do pool: deixa ao menos uma thread de requisição livre para leituras"""
+    pending = getattr(settings, 'PASSWORD_HASH_MAX_PENDING', DEFAULT_MAX_PENDING)
+    threads = getattr(settings, 'PASSWORD_HASH_REQUEST_THREADS', DEFAULT_REQUEST_THREADS)
+    return max(1, min(pending, threads - 1))
+
+
+_admission = threading.BoundedSemaphore(admission_limit())
+
+
+def run_hashing(func, *args):
+    """Executa func no pool de hash e espera o resultado"""
+    if not _admission.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return _executor.submit(func, *args).result()
+    finally:
+        _admission.release()
+
+
+def hash_password(raw_password):
+    return run_hashing(make_password, raw_password)
+
+
+def verify_password(user, raw_password):
+    """
+    Equivalente a user.check_password, com o hash feito no pool.
+
+    Como em check_password, a senha é regravada quando o algoritmo ou o
+    número de iterações preferido mudou.
+    """
+    encoded = user.password
+    if not run_hashing(check_password, raw_password, encoded):
+        return False
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return True
+    preferred = get_hasher('default')
+    if hasher.algorithm != preferred.algorithm or preferred.must_update(encoded):
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return True
+
+
+def authenticate_credentials(username, raw_password):
+    """
+    Substitui authenticate() para o ModelBackend com o hash feito no pool.
+
+    Para usuários inexistentes também calcula um hash, como o ModelBackend,
+    para que o tempo de resposta não revele quais nomes existem.
+    """
+    User = get_user_model()
+    try:
+        user = User._default_manager.get_by_natural_key(username)
+    except User.DoesNotExist:
+        hash_password(raw_password)
+        return None
+    return authenticate_user(user, raw_password)
+
+
+def authenticate_user(user, raw_password):
+    """Confere a senha de um usuário já carregado; retorna o usuário ou None"""
+    if verify_password(user, raw_password) and user.is_active:
+        return user
+    return None
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+INDEX_NAME = 'auth_user_email_lower_idx'
+
+
+def create_email_index(apps, schema_editor):
+    # CONCURRENTLY evita bloquear auth_user durante a criação em produção
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute(
+        f'CREATE INDEX {concurrently}IF NOT EXISTS {INDEX_NAME} ON auth_user (LOWER(email))'
+    )
+
+
+def drop_email_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_convert_profile_image_to_cloudinary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_index, drop_email_index),
+    ]
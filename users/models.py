@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from cloudinary.models import CloudinaryField
 
@@ -20,4 +21,15 @@ class UserProfile(models.Model):
     updated_at = models.DateTimeField(auto_now=True, null=True)
 
     def __str__(self):
-        return f"{self.user.username}'s profile"
\ No newline at end of file
+        return f"{self.user.username}'s profile"
+
+
+def users_with_email(email):
+    """
+    Usuários com o email informado, sem diferenciar maiúsculas e minúsculas.
+
+    Filtra por LOWER(email), que usa o índice auth_user_email_lower_idx
+    (migração 0004) em vez de percorrer toda a tabela auth_user.
+    """
+    return User.objects.annotate(email_lower=Lower('email'))\
+        .filter(email_lower=email.strip().lower())
@@ -1,15 +1,41 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from backend.perf import TimedSerializerMixin
 from django.core.validators import RegexValidator
-from .models import UserProfile
+from .models import UserProfile, users_with_email
+from .hashing import HashingBusy, hash_password
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ['description', 'profile_image', 'social_links', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
-class UserSerializer(serializers.ModelSerializer):
+def public_profile_data(user, request=None):
+    """
+    Dados públicos do perfil exibidos na página do usuário.
+
+    Sem request a imagem padrão fica com o caminho relativo, para quem guarda
+    o resultado em cache e monta a URL absoluta a cada resposta.
+    """
+    profile = user.profile
+    data = {
+        'id': user.id,
+        'username': user.username,
+        'description': profile.description,
+        'socialLinks': profile.social_links or {}
+    }
+    # Tratar a URL da imagem de perfil (Cloudinary)
+    if profile.profile_image and hasattr(profile.profile_image, 'url'):
+        # Cloudinary já fornece URL completa
+        data['profileImage'] = str(profile.profile_image.url)
+    else:
+        data['profileImage'] = '/media/default/default_profile.svg'
+        if request is not None:
+            data['profileImage'] = request.build_absolute_uri(data['profileImage'])
+    return data
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     profile = UserProfileSerializer(read_only=True)
     password = serializers.CharField(write_only=True, min_length=8)
     email = serializers.EmailField(required=True)
@@ -40,18 +66,22 @@ class UserSerializer(serializers.ModelSerializer):
         return value
 
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        if users_with_email(value).exists():
             raise serializers.ValidationError('Este email já está cadastrado.')
         return value
 
     def create(self, validated_data):
         try:
-            user = User.objects.create_user(
-                username=validated_data['username'],
-                email=validated_data['email'],
-                password=validated_data['password']
+            # Mesmo resultado de create_user, com o hash feito no pool (users.hashing)
+            user = User(
+                username=User.normalize_username(validated_data['username']),
+                email=User.objects.normalize_email(validated_data['email']),
+                password=hash_password(validated_data['password']),
             )
+            user.save()
             # O perfil é criado automaticamente pelo signal post_save
             return user
+        except HashingBusy:
+            raise
         except Exception as e:
             raise serializers.ValidationError(f"Erro ao criar usuário: {str(e)}")
\ No newline at end of file
@@ -2,25 +2,34 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import UserProfile
+from .authentication import invalidate_cached_user
+from . import availability
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """Cria automaticamente um perfil quando um usuário é criado"""
+    # Um usuário recém-criado ainda não tem perfil; outras gravações do
+    # usuário (login, troca de senha) não tocam no perfil
     if created:
-        # Verificar se já existe um perfil para este usuário antes de criar um novo
-        if not UserProfile.objects.filter(user=instance).exists():
-            UserProfile.objects.create(user=instance)
+        UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_cache(sender, instance, update_fields=None, **kwargs):
+    """Descarta o usuário em cache da autenticação JWT (inclui trocas de senha)"""
+    # O login só atualiza last_login, que não é usado a partir do cache
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Salva o perfil do usuário quando o usuário é salvo"""
-    try:
-        if hasattr(instance, 'profile'):
-            instance.profile.save()
-    except Exception as e:
-        # Verificar se já existe um perfil antes de criar um novo
-        if not UserProfile.objects.filter(user=instance).exists():
-            UserProfile.objects.create(user=instance)
-        import logging
-        logger = logging.getLogger('django')
-        logger.error(f"Erro ao salvar perfil do usuário: {str(e)}")
\ No newline at end of file
+def add_user_to_availability_filter(sender, instance, created, update_fields=None, **kwargs):
+    # Nome de usuário e email só mudam no cadastro ou em gravações completas
+    if created or update_fields is None or {'username', 'email'} & set(update_fields):
+        availability.add_user(instance)
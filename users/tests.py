@@ -0,0 +1,340 @@
+import io
+import os
+import runpy
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import stats
+from . import hashing, availability, views
+
+
+def user_queries(ctx):
+    return [q['sql'] for q in ctx.captured_queries if 'FROM "auth_user"' in q['sql']]
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+        self.user = User.objects.create_user(username='jwtuser', email='jwt@example.com', password='12345678')
+        token = RefreshToken.for_user(self.user).access_token
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_user_and_profile_come_from_cache(self):
+        self.client.get(reverse('current_user_info'), **self.auth)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('current_user_info'), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'jwtuser')
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(stats.snapshot(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_profile_and_password_changes_invalidate(self):
+        self.client.get(reverse('current_user_info'), **self.auth)
+        self.user.profile.description = 'Nova descrição'
+        self.user.profile.save()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('current_user_info'), **self.auth)
+        self.assertEqual(len(user_queries(ctx)), 1)
+        self.assertEqual(response.json()['profile']['description'], 'Nova descrição')
+
+        response = self.client.post(
+            '/api/auth/change-password/',
+            {'current_password': '12345678', 'new_password': 'outrasenha1'},
+            content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('current_user_info'), **self.auth)
+        self.assertEqual(len(user_queries(ctx)), 1)
+
+    def test_stats_endpoint_requires_admin(self):
+        self.assertEqual(self.client.get(reverse('auth_cache_stats'), **self.auth).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('auth_cache_stats'), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_rate', response.json())
+
+
+def writes(ctx, table):
+    return [
+        q['sql'] for q in ctx.captured_queries
+        if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')) and f'"{table}"' in q['sql']
+    ]
+
+
+class AccountWriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_register_creates_user_and_profile_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/register/', {
+                'username': 'novousuario', 'email': 'novo@example.com', 'password': '12345678'
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('access', response.json())
+        self.assertEqual(len(writes(ctx, 'users_userprofile')), 1)
+        # INSERT do usuário e UPDATE de last_login feito por login()
+        self.assertEqual(len(writes(ctx, 'auth_user')), 2)
+
+    def test_login_does_not_write_profile(self):
+        User.objects.create_user(username='loginuser', email='login@example.com', password='12345678')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/login/', {
+                'identifier': 'loginuser', 'password': '12345678'
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(writes(ctx, 'users_userprofile'), [])
+        self.assertEqual(len(writes(ctx, 'auth_user')), 1)
+
+    def test_change_password_updates_only_password(self):
+        user = User.objects.create_user(username='pwduser', email='pwd@example.com', password='12345678')
+        token = RefreshToken.for_user(user).access_token
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                '/api/auth/change-password/',
+                {'current_password': '12345678', 'new_password': 'outrasenha1'},
+                content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(writes(ctx, 'users_userprofile'), [])
+        user_writes = writes(ctx, 'auth_user')
+        self.assertEqual(len(user_writes), 1)
+        self.assertNotIn('last_login', user_writes[0])
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='hashuser', email='hash@example.com', password='12345678')
+
+    def test_login_runs_hash_in_pool(self):
+        threads = []
+        original = hashing.check_password
+
+        def tracking_check(*args):
+            threads.append(threading.current_thread().name)
+            return original(*args)
+
+        with mock.patch.object(hashing, 'check_password', tracking_check):
+            response = self.client.post('/api/auth/login/', {
+                'identifier': 'hashuser', 'password': '12345678'
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(threads[0].startswith('password-hash'))
+
+        response = self.client.post('/api/auth/login/', {
+            'identifier': 'hashuser', 'password': 'errada123'
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_admission_leaves_a_request_thread_free(self):
+        with override_settings(PASSWORD_HASH_MAX_PENDING=16, PASSWORD_HASH_REQUEST_THREADS=4):
+            self.assertEqual(hashing.admission_limit(), 3)
+        with override_settings(PASSWORD_HASH_MAX_PENDING=2, PASSWORD_HASH_REQUEST_THREADS=8):
+            self.assertEqual(hashing.admission_limit(), 2)
+        with override_settings(PASSWORD_HASH_REQUEST_THREADS=1):
+            self.assertEqual(hashing.admission_limit(), 1)
+
+    def test_saturated_pool_returns_503(self):
+        # Logins em andamento ocupando todas as vagas do pool real
+        release = threading.Event()
+
+        def slow_hash():
+            release.wait(5)
+
+        holders = [
+            threading.Thread(target=hashing.run_hashing, args=(slow_hash,))
+            for _ in range(hashing.admission_limit())
+        ]
+        for holder in holders:
+            holder.start()
+        try:
+            # Esperar até todas as vagas estarem ocupadas
+            for _ in range(500):
+                if not hashing._admission.acquire(blocking=False):
+                    break
+                hashing._admission.release()
+                time.sleep(0.01)
+            started = time.monotonic()
+            response = self.client.post('/api/auth/login/', {
+                'identifier': 'hashuser', 'password': '12345678'
+            }, content_type='application/json')
+            elapsed = time.monotonic() - started
+            # Leituras continuam sendo atendidas com o pool cheio
+            read = self.client.get(reverse('check_availability'), {'username': 'livre'})
+        finally:
+            release.set()
+            for holder in holders:
+                holder.join()
+        self.assertEqual(response.status_code, 503)
+        self.assertLess(elapsed, 0.5)  # recusa na hora, sem prender a thread esperando vaga
+        self.assertEqual(read.status_code, 200)
+        self.assertEqual(response['Retry-After'], str(hashing.RETRY_AFTER_SECONDS))
+
+        response = self.client.post('/api/auth/login/', {
+            'identifier': 'hashuser', 'password': '12345678'
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+
+class EmailLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='emailuser', email='Maria@Example.com', password='12345678')
+
+    def test_login_by_email_ignores_case_and_uses_lower(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/login/', {
+                'identifier': 'maria@example.COM', 'password': '12345678'
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['username'], 'emailuser')
+        lookups = user_queries(ctx)
+        self.assertIn('LOWER("auth_user"."email")', lookups[0])
+        self.assertEqual(len(lookups), 1)
+
+    def test_register_rejects_email_in_other_case(self):
+        response = self.client.post('/api/auth/register/', {
+            'username': 'outrousuario', 'email': 'MARIA@example.com', 'password': '12345678'
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json()['detail'])
+
+
+class SessionModeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='sessionuser', email='session@example.com', password='12345678')
+
+    def login(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/auth/login/', {
+                'identifier': 'sessionuser', 'password': '12345678'
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response, ctx
+
+    @override_settings(AUTH_SESSION_MODE='jwt')
+    def test_jwt_mode_writes_no_session(self):
+        response, ctx = self.login()
+        self.assertEqual(writes(ctx, 'django_session'), [])
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertIsNotNone(User.objects.get(username='sessionuser').last_login)
+
+    @override_settings(AUTH_SESSION_MODE='session')
+    def test_session_mode_keeps_django_login(self):
+        response, ctx = self.login()
+        self.assertGreater(len(writes(ctx, 'django_session')), 0)
+        self.assertIn('sessionid', response.cookies)
+
+    def test_clear_expired_sessions_in_batches(self):
+        from django.contrib.sessions.models import Session
+        from django.core.management import call_command
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create([
+            Session(session_key=f'expired{i}', session_data='', expire_date=past) for i in range(5)
+        ])
+        Session.objects.create(session_key='active', session_data='', expire_date=timezone.now() + timedelta(days=1))
+
+        call_command('clear_expired_sessions', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['active'])
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        availability.reset()
+        # A remontagem em segundo plano usaria outra conexão, fora da transação do teste
+        patcher = mock.patch.object(availability, '_start_refresh')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        User.objects.create_user(username='ocupado', email='ocupado@example.com', password='12345678')
+
+    def tearDown(self):
+        availability.reset()
+
+    def test_unknown_names_answered_without_queries(self):
+        availability.warm_up()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('check_availability'), {'username': 'livre', 'email': 'livre@example.com'})
+        self.assertEqual(response.json(), {
+            'username': {'value': 'livre', 'available': True},
+            'email': {'value': 'livre@example.com', 'available': True},
+        })
+
+    def test_taken_names_confirmed_in_database(self):
+        response = self.client.get(reverse('check_availability'), {'username': 'ocupado', 'email': 'OCUPADO@example.com'})
+        self.assertFalse(response.json()['username']['available'])
+        self.assertFalse(response.json()['email']['available'])
+
+    def test_new_users_are_added_to_filter(self):
+        availability.warm_up()
+        User.objects.create_user(username='recente', email='recente@example.com', password='12345678')
+        response = self.client.get(reverse('check_availability'), {'username': 'recente'})
+        self.assertFalse(response.json()['username']['available'])
+
+    def test_filter_is_built_when_worker_starts(self):
+        hooks = runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+        with mock.patch('django.db.connections.close_all') as close_all:
+            hooks['post_worker_init'](mock.Mock())
+        close_all.assert_called_once()
+        with self.assertNumQueries(0):
+            self.assertTrue(availability.username_available('livre'))
+
+    def test_expired_filter_is_rebuilt_off_the_request(self):
+        availability.warm_up()
+        User.objects.create_user(username='outroworker', password='12345678')
+        with mock.patch.object(availability, '_filter', availability.BloomFilter(10)), \
+                mock.patch.object(availability, '_built_at', 0), \
+                mock.patch.object(availability, '_start_refresh') as start_refresh:
+            with self.assertNumQueries(0):
+                self.assertTrue(availability.username_available('livre'))
+            start_refresh.assert_called_once()
+            availability.get_filter()
+            start_refresh.assert_called_once()  # uma remontagem por vez
+
+        availability.reset()
+        with mock.patch.object(availability, '_start_refresh') as start_refresh:
+            # Sem filtro a resposta vem do banco, sem varrer auth_user
+            with self.assertNumQueries(1):
+                self.assertFalse(availability.username_available('outroworker'))
+        start_refresh.assert_called_once()
+
+    def test_users_created_during_rebuild_are_kept(self):
+        original = availability.build_filter
+
+        def build_with_concurrent_signup():
+            bloom = original()
+            User.objects.create_user(username='durante', password='12345678')
+            return bloom
+
+        with mock.patch.object(availability, 'build_filter', build_with_concurrent_signup):
+            bloom = availability.rebuild()
+        self.assertIn('u:durante', bloom)
+
+    def test_warm_up_survives_database_errors(self):
+        with mock.patch.object(availability, 'build_filter', side_effect=DatabaseError('fora do ar')):
+            availability.warm_up()
+        self.assertTrue(availability.username_available('livre'))
+
+    def test_endpoint_has_its_own_rate_limit(self):
+        # THROTTLE_RATES é lido na definição da classe; trocar direto na throttle
+        with mock.patch.object(views.AvailabilityRateThrottle, 'THROTTLE_RATES', {'availability': '2/min'}):
+            codes = [
+                self.client.get(reverse('check_availability'), {'username': 'x'}).status_code
+                for _ in range(3)
+            ]
+        self.assertEqual(codes, [200, 200, 429])
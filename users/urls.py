@@ -6,5 +6,6 @@ urlpatterns = [
     path('', views.get_user_info, name='user_info'),
     path('me/', views.get_user_info, name='current_user_info'),
     path('profile/', views.update_profile, name='update_profile'),
+    path('auth-cache/stats/', views.get_auth_cache_stats, name='auth_cache_stats'),
     path('<str:username>/', views.get_user_by_username, name='get_user_by_username'),
 ]
\ No newline at end of file
@@ -5,6 +5,7 @@ from rest_framework_simplejwt.views import TokenRefreshView
 urlpatterns = [
     path('register/', views.register_user, name='register'),
     path('login/', views.login_user, name='login'),
+    path('availability/', views.check_availability, name='check_availability'),
     path('logout/', views.logout_user, name='logout'),
     path('profile/', views.update_profile, name='update_profile'),
     path('change-password/', views.change_password, name='change_password'),
@@ -1,12 +1,15 @@
-from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from django.contrib.auth import login, logout
+from django.contrib.auth.signals import user_logged_in
 from django.contrib.auth.models import User
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes, throttle_classes
+from rest_framework.throttling import UserRateThrottle
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from .models import UserProfile
-from .serializers import UserProfileSerializer, UserSerializer
+from .models import UserProfile, users_with_email
+from .serializers import UserProfileSerializer, UserSerializer, public_profile_data
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 import logging
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -15,13 +18,46 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.contrib.auth.hashers import make_password
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from backend.cache_control_middleware import cache_policy
+from .authentication import auth_cache_stats
+from . import availability
+from .hashing import (
+    HashingBusy, RETRY_AFTER_SECONDS,
+    authenticate_credentials, authenticate_user, hash_password, verify_password
+)
 import json
 import os
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+
+def start_session(request, user):
+    """
+    Registra o login conforme settings.AUTH_SESSION_MODE.
+
+    - 'session': login() do Django, que grava a sessão (cookie sessionid);
+    - 'jwt': os clientes usam apenas os tokens da resposta, então nenhuma
+      sessão é gravada; só o sinal user_logged_in é enviado (last_login).
+    """
+    if getattr(settings, 'AUTH_SESSION_MODE', 'session') == 'session':
+        login(request, user, backend=MODEL_BACKEND)
+    else:
+        user_logged_in.send(sender=user.__class__, request=request, user=user)
+
+
+def hashing_busy_response():
+    """Resposta para quando o pool de hash de senhas está saturado"""
+    response = Response(
+        {'error': 'Servidor ocupado, tente novamente em instantes'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -72,26 +108,22 @@ def register_user(request):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
             try:
-                user = serializer.save()
+                # Usuário e perfil (criado pelo signal) na mesma transação
+                with transaction.atomic():
+                    user = serializer.save()
                 logger.info(f"Usuário registrado com sucesso: {user.username}")
-                user = authenticate(
-                    username=request.data.get('username'),
-                    password=request.data.get('password')
-                )
-                if user:
-                    login(request, user)
-                    refresh = RefreshToken.for_user(user)
-                    return Response({
-                        'user': UserSerializer(user).data,
-                        'message': 'Registro realizado com sucesso',
-                        'access': str(refresh.access_token),
-                        'refresh': str(refresh),
-                    }, status=status.HTTP_201_CREATED)
-                else:
-                    return Response({
-                        'user': UserSerializer(user).data,
-                        'message': 'Usuário registrado com sucesso, mas falha ao autenticar automaticamente.'
-                    }, status=status.HTTP_201_CREATED)
+                # A senha acabou de ser definida: login direto, sem o segundo
+                # hash que authenticate() faria
+                start_session(request, user)
+                refresh = RefreshToken.for_user(user)
+                return Response({
+                    'user': UserSerializer(user).data,
+                    'message': 'Registro realizado com sucesso',
+                    'access': str(refresh.access_token),
+                    'refresh': str(refresh),
+                }, status=status.HTTP_201_CREATED)
+            except HashingBusy:
+                return hashing_busy_response()
             except Exception as e:
                 logger.error(f"Erro ao salvar usuário: {str(e)}")
                 # Tratamento específico para erro de duplicidade de perfil
@@ -126,6 +158,34 @@ def register_user(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class AvailabilityRateThrottle(UserRateThrottle):
+    """Limite próprio da verificação de disponibilidade (por usuário ou IP)"""
+    scope = 'availability'
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@throttle_classes([AvailabilityRateThrottle])
+def check_availability(request):
+    """
+    Informa se ?username= e/ou ?email= estão livres para cadastro.
+
+    Nomes que nunca foram cadastrados são respondidos pelo filtro de Bloom
+    (users.availability) sem consultar o banco.
+    """
+    username = request.GET.get('username', '').strip()
+    email = request.GET.get('email', '').strip()
+    if not username and not email:
+        return Response({'error': 'Informe username ou email'}, status=status.HTTP_400_BAD_REQUEST)
+
+    data = {}
+    if username:
+        data['username'] = {'value': username, 'available': availability.username_available(username)}
+    if email:
+        data['email'] = {'value': email, 'available': availability.email_available(email)}
+    return Response(data)
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Permitir acesso não autenticado explicitamente
 def login_user(request):
@@ -135,25 +195,26 @@ def login_user(request):
         
         logger.info(f"Tentativa de login com identificador: {identifier}")
         
+        # Hash da senha no pool limitado (users.hashing), fora da thread da requisição
         # Verificar se o identificador é um email ou nome de usuário
         if '@' in identifier:
-            # Tentar autenticar com email
-            try:
-                user_obj = User.objects.get(email=identifier)
-                username = user_obj.username
-            except User.DoesNotExist:
+            # Tentar autenticar com email (busca pelo índice em LOWER(email))
+            user_obj = users_with_email(identifier).first()
+            if user_obj is None:
                 logger.warning(f"Usuário não encontrado com email: {identifier}")
                 return Response(
                     {'error': 'Usuário não encontrado com este email'},
                     status=status.HTTP_401_UNAUTHORIZED
                 )
+            username = user_obj.username
+            user = authenticate_user(user_obj, password)
         else:
             # Usar o identificador como nome de usuário
             username = identifier
-        
-        user = authenticate(username=username, password=password)
+            user = authenticate_credentials(username, password)
+
         if user:
-            login(request, user)
+            start_session(request, user)
             refresh = RefreshToken.for_user(user)
             # Incluir dados do usuário na resposta para evitar deslogamento automático
             serializer = UserSerializer(user)
@@ -169,6 +230,8 @@ def login_user(request):
             {'error': 'Credenciais inválidas'},
             status=status.HTTP_401_UNAUTHORIZED
         )
+    except HashingBusy:
+        return hashing_busy_response()
     except Exception as e:
         logger.error(f"Erro não tratado durante o login: {str(e)}")
         return Response({
@@ -197,13 +260,23 @@ def delete_all_users(request):
     except Exception as e:
         return Response({'error': f'Erro ao excluir usuários: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_auth_cache_stats(request):
+    """Taxa de acerto do cache de usuários da autenticação JWT neste worker"""
+    return Response(auth_cache_stats())
+
 @api_view(['GET', 'PUT', 'PATCH', 'OPTIONS'])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser, JSONParser])
 def update_profile(request):
     """Atualiza o perfil do usuário."""
     user = request.user
-    profile = user.profile
+    try:
+        profile = user.profile
+    except UserProfile.DoesNotExist:
+        # Usuários antigos podem não ter perfil
+        profile = UserProfile.objects.create(user=user)
     
     # Log para depuração
     print(f"Dados recebidos: {request.data}")
@@ -280,15 +353,18 @@ def change_password(request):
     
     # Verificar se a senha atual está correta
     user = request.user
-    if not user.check_password(current_password):
-        return Response(
-            {'error': 'Senha atual incorreta'}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Alterar a senha
-    user.set_password(new_password)
-    user.save()
+    try:
+        if not verify_password(user, current_password):
+            return Response(
+                {'error': 'Senha atual incorreta'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Alterar a senha
+        user.password = hash_password(new_password)
+    except HashingBusy:
+        return hashing_busy_response()
+    user.save(update_fields=['password'])
     
     # Gerar novos tokens JWT para manter o usuário logado
     refresh = RefreshToken.for_user(user)
@@ -299,6 +375,7 @@ def change_password(request):
         'refresh': str(refresh)
     })
 
+@cache_policy(max_age=120, stale_while_revalidate=600)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_user_by_username(request, username):
@@ -308,21 +385,6 @@ def get_user_by_username(request, username):
         if not profile:
             return Response({'error': 'Perfil não encontrado'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Combinar dados do usuário e perfil
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'description': profile.description,
-            'socialLinks': profile.social_links or {}
-        }
-        
-        # Tratar a URL da imagem de perfil (Cloudinary)
-        if profile.profile_image and hasattr(profile.profile_image, 'url'):
-            # Cloudinary já fornece URL completa
-            user_data['profileImage'] = str(profile.profile_image.url)
-        else:
-            user_data['profileImage'] = request.build_absolute_uri('/media/default/default_profile.svg')
-        
-        return Response(user_data)
+        return Response(public_profile_data(user, request))
     except User.DoesNotExist:
         return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file